@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,10 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_inline(settings):
+    # Фоновый поток миниатюр мешает тестам, которые сами пишут в базу
+    # и удаляют каталог медиа: генерируем миниатюры в самом запросе.
+    settings.POST_THUMBNAIL_WORKERS = 0
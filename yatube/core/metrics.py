@@ -0,0 +1,295 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+THUMBNAIL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Пространство имён маршрутов, для которых пишется время ответа.
+MEASURED_NAMESPACE = 'posts'
+FAMILIES = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа по маршрутам posts.'
+    ),
+    'yatube_db_queries_total': (
+        'counter', 'SQL-запросы ответов по маршрутам posts.'
+    ),
+    'yatube_page_cache_total': (
+        'counter', 'Попадания и промахи кэша страниц лент.'
+    ),
+    'yatube_thumbnail_generations_total': (
+        'counter', 'Генерации миниатюр картинки поста.'
+    ),
+    'yatube_thumbnail_generation_seconds': (
+        'histogram', 'Время генерации миниатюр картинки поста.'
+    ),
+}
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+# Сумма файлов завершённых процессов и блокировка на время её сборки.
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = 'compact.lock'
+
+
+def _read(path, default):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def _write(path, data):
+    # Читатель видит либо прежний файл целиком, либо новый.
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class ProcessStore:
+    """Метрики процесса в памяти и в своём файле METRICS_DIR.
+
+    Процесс пишет только свой файл, поэтому блокировки между процессами
+    не нужны; эндпоинт складывает файлы всех процессов.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.name = None
+        self.values = defaultdict(float)
+        self.flushed = 0
+
+    def _reset_after_fork(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            # pid повторно выдаётся новым процессам: без uuid новый
+            # процесс затёр бы файл завершённого, и счётчики пошли бы назад.
+            self.name = f'{self.pid}-{uuid.uuid4().hex}.json'
+            self.values = defaultdict(float)
+            self.flushed = 0
+
+    def add(self, samples):
+        """Прибавляет значения [(имя, метки, число)] одной операцией."""
+        if not settings.METRICS_DIR:
+            return
+        with self.lock:
+            self._reset_after_fork()
+            for name, labels, amount in samples:
+                self.values[_key(name, labels)] += amount
+            due = time.monotonic() - self.flushed
+        if due >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not settings.METRICS_DIR:
+            return
+        with self.lock:
+            self._reset_after_fork()
+            self.flushed = time.monotonic()
+            rows = [
+                [name, list(labels), value]
+                for (name, labels), value in self.values.items()
+            ]
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _write(os.path.join(settings.METRICS_DIR, self.name), rows)
+
+
+store = ProcessStore()
+atexit.register(store.flush)
+
+
+def inc(name, labels, amount=1):
+    store.add([(name, labels, amount)])
+
+
+def observe(name, labels, value, buckets):
+    """Наблюдение гистограммы: накопительные корзины, сумма и число."""
+    samples = [
+        (f'{name}_bucket', {**labels, 'le': str(bound)}, 1)
+        for bound in buckets
+        if value <= bound
+    ]
+    samples += [
+        (f'{name}_bucket', {**labels, 'le': '+Inf'}, 1),
+        (f'{name}_sum', labels, value),
+        (f'{name}_count', labels, 1),
+    ]
+    store.add(samples)
+
+
+def _add_rows(totals, rows):
+    for name, labels, value in rows:
+        totals[name, tuple(map(tuple, labels))] += value
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _process_files():
+    """{имя файла: pid} файлов процессов в METRICS_DIR."""
+    files = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*-*.json')):
+        name = os.path.basename(path)
+        pid = name.split('-', 1)[0]
+        if pid.isdigit():
+            files[name] = int(pid)
+    return files
+
+
+def _compact(directory):
+    """Складывает файлы завершённых процессов в AGGREGATE_FILE.
+
+    В сводном файле записаны имена уже учтённых файлов: если процесс
+    упадёт до их удаления, они не войдут в сумму дважды.
+    """
+    path = os.path.join(directory, AGGREGATE_FILE)
+    aggregate = _read(path, {'files': [], 'rows': []})
+    for name in aggregate['files']:
+        if os.path.exists(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+    dead = [
+        name for name, pid in _process_files().items() if not _is_alive(pid)
+    ]
+    if not dead:
+        return aggregate
+    totals = defaultdict(float)
+    _add_rows(totals, aggregate['rows'])
+    for name in dead:
+        _add_rows(totals, _read(os.path.join(directory, name), []))
+    aggregate = {
+        'files': dead,
+        'rows': [
+            [name, list(labels), value]
+            for (name, labels), value in totals.items()
+        ],
+    }
+    _write(path, aggregate)
+    for name in dead:
+        os.remove(os.path.join(directory, name))
+    return aggregate
+
+
+def collect():
+    """Сумма значений живых процессов и сводки завершённых.
+
+    Сбор идёт под блокировкой: параллельный сбор не пропустит файл
+    процесса и не учтёт его дважды.
+    """
+    store.flush()
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    totals = defaultdict(float)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        aggregate = _compact(directory)
+        _add_rows(totals, aggregate['rows'])
+        for name in _process_files():
+            if name not in aggregate['files']:
+                _add_rows(totals, _read(os.path.join(directory, name), []))
+    return totals
+
+
+def _family(name):
+    for suffix in HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def _sort_key(item):
+    (name, labels), _ = item
+    le = dict(labels).get('le')
+    bound = float(le) if le is not None else 0
+    return (
+        tuple(pair for pair in labels if pair[0] != 'le'),
+        name,
+        bound,
+    )
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace('\\', r'\\')
+        .replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _number(value):
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+def render(totals):
+    """Текстовый формат Prometheus."""
+    families = defaultdict(list)
+    for item in totals.items():
+        families[_family(item[0][0])].append(item)
+    lines = []
+    for family in sorted(families):
+        kind, description = FAMILIES.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {kind}')
+        for (name, labels), value in sorted(families[family], key=_sort_key):
+            pairs = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+            label_text = f'{{{pairs}}}' if pairs else ''
+            lines.append(f'{name}{label_text} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Время ответа и число SQL-запросов маршрутов posts.
+
+    Включается настройкой METRICS_DIR.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        if match is not None and match.namespace == MEASURED_NAMESPACE:
+            labels = {'view': match.view_name}
+            observe(
+                'yatube_request_duration_seconds',
+                labels,
+                elapsed,
+                LATENCY_BUCKETS,
+            )
+            inc('yatube_db_queries_total', labels, queries[0])
+        return response
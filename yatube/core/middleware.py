@@ -0,0 +1,126 @@
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+VALUE_LISTS = re.compile(r'\(\?(?:, \?)*\)')
+
+
+def fingerprint(sql):
+    """Форма запроса без значений: WHERE id = 1 и id = 2 - одно и то же."""
+    sql = LITERALS.sub('?', sql.replace('%s', '?'))
+    return VALUE_LISTS.sub('(?)', sql)
+
+
+def query_origin():
+    """Строка шаблона и место в коде проекта, откуда пришёл запрос."""
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and template is None:
+        node = frame.f_locals.get('self')
+        if frame.f_code.co_name == 'render_annotated' and node is not None:
+            origin = getattr(node, 'origin', None)
+            if origin is not None:
+                name = origin.template_name or origin.name
+                template = f'{name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            code is None
+            and filename != __file__
+            and filename.startswith(settings.BASE_DIR)
+            and 'site-packages' not in filename
+        ):
+            code = (
+                f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno} ({frame.f_code.co_name})'
+            )
+        frame = frame.f_back
+    return ', '.join(filter(None, (template, code))) or '?'
+
+
+class QueryRecorder:
+    """execute_wrapper: считает запросы, время и повторы одной формы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            shape = fingerprint(sql)
+            self.shapes[shape] += 1
+            # Стек разбираем один раз и только для повторяющихся форм.
+            if self.shapes[shape] == 2:
+                self.origins[shape] = query_origin()
+
+    def repeated(self, threshold):
+        """(форма, сколько раз, откуда) для форм не реже threshold раз."""
+        return [
+            (shape, total, self.origins[shape])
+            for shape, total in self.shapes.most_common()
+            if total >= threshold
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    """Число и время SQL-запросов выборки запросов, поиск N+1.
+
+    При SQL_INSTRUMENTATION_SAMPLE_RATE = 0 выключается целиком.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        self.report(request, recorder)
+        return response
+
+    def report(self, request, recorder):
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        repeated = recorder.repeated(settings.SQL_REPEATED_QUERY_THRESHOLD)
+        level = logging.DEBUG
+        if repeated or recorder.count > settings.SQL_QUERY_COUNT_THRESHOLD:
+            level = logging.WARNING
+        logger.log(
+            level,
+            '%s: %d SQL-запросов за %.1f мс',
+            view,
+            recorder.count,
+            recorder.duration * 1000,
+        )
+        for shape, total, origin in repeated:
+            logger.warning(
+                '%s: N+1, %d одинаковых запросов из %s: %s',
+                view,
+                total,
+                origin,
+                shape,
+            )
@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+def _short(filename):
+    """Путь файла без site-packages или каталога проекта."""
+    marker = f'site-packages{os.sep}'
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(settings.BASE_DIR):
+        return os.path.relpath(filename, settings.BASE_DIR)
+    return filename
+
+
+def collapse(frame):
+    """Стек от корня к листу в формате collapsed: функции через «;»."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f'{code.co_name} ({_short(code.co_filename)}:'
+            f'{code.co_firstlineno})'.replace(';', ',')
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Один фоновый поток снимает стеки потоков, занятых запросами.
+
+    Пока запросов нет, поток спит на событии и не тратит процессор.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self.active[thread_id] = stacks
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='profiler', daemon=True
+                )
+                self.thread.start()
+        self.wakeup.set()
+        return stacks
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.active.pop(thread_id, Counter())
+
+    def run(self):
+        while True:
+            with self.lock:
+                idle = not self.active
+                if idle:
+                    self.wakeup.clear()
+            if idle:
+                self.wakeup.wait()
+                continue
+            time.sleep(settings.PROFILER_INTERVAL_MS / 1000)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+
+
+sampler = Sampler()
+
+
+def write_profile(stacks, view, elapsed_ms, queries):
+    """Файл для flamegraph.pl или speedscope; корень стека - маршрут."""
+    os.makedirs(settings.PROFILER_DIR, exist_ok=True)
+    name = (
+        f'{view.replace(":", "-")}-{elapsed_ms:.0f}ms-{queries}q-'
+        f'{time.time_ns()}.folded'
+    )
+    root = f'{view} [{queries} queries]'
+    path = os.path.join(settings.PROFILER_DIR, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        for stack, count in stacks.most_common():
+            file.write(f'{root};{stack} {count}\n')
+    return path
+
+
+class SamplingProfilerMiddleware:
+    """Стеки медленных запросов в PROFILER_DIR; без настройки выключен.
+
+    Стек снимается каждые PROFILER_INTERVAL_MS, а сохраняются только
+    запросы дольше PROFILER_THRESHOLD_MS.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        thread_id = threading.get_ident()
+        started = time.perf_counter()
+        sampler.start(thread_id)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count))
+                response = self.get_response(request)
+        finally:
+            stacks = sampler.stop(thread_id)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= settings.PROFILER_THRESHOLD_MS and stacks:
+            match = request.resolver_match
+            view = match.view_name if match else 'unresolved'
+            write_profile(stacks, view, elapsed_ms, queries[0])
+        return response
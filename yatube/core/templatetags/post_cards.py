@@ -0,0 +1,48 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.thumbnails import post_renditions
+
+register = template.Library()
+
+
+def card_cache_key(post, flags):
+    """Ключ карточки меняется вместе с постом, его группой и картинкой."""
+    version = '|'.join(
+        str(part)
+        for part in (
+            post.updated.timestamp(),
+            post.image.name,
+            sum(1 for image in post_renditions(post).values() if image),
+            post.group.slug if post.group_id else '',
+            post.author.username,
+            post.comments_count,
+            *flags,
+        )
+    )
+    digest = hashlib.md5(version.encode()).hexdigest()
+    return f'post_card:{post.pk}:{digest}'
+
+
+@register.simple_tag
+def post_cards(posts, flag_group=False, flag_profile=False):
+    """Карточки постов страницы; кэш читается одним get_many."""
+    context = {'flag_group': flag_group, 'flag_profile': flag_profile}
+    keys = {
+        card_cache_key(post, (flag_group, flag_profile)): post
+        for post in posts
+    }
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in keys.items():
+        if key not in cards:
+            missing[key] = cards[key] = render_to_string(
+                'posts/includes/post_card.html', {'post': post, **context}
+            )
+    cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
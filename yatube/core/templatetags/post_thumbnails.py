@@ -0,0 +1,15 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def post_thumbnail(post):
+    return thumbnails.post_thumbnail(post)
+
+
+@register.filter
+def post_image_sources(post):
+    return thumbnails.post_image_sources(post)
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post, User
+
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+# Наибольший pid_t: такого процесса не бывает.
+DEAD_PID = 2 ** 31 - 1
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics.store.values.clear()
+        for name in os.listdir(TEMP_METRICS_DIR):
+            os.remove(os.path.join(TEMP_METRICS_DIR, name))
+
+    def scrape(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_requests_and_page_cache_are_counted(self):
+        """Эндпоинт отдаёт время ответов, запросы к БД и попадания в кэш."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        lines = self.scrape()
+        self.assertIn(
+            '# TYPE yatube_request_duration_seconds histogram', lines
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{le="+Inf",view="posts:index"} 2',
+            lines,
+        )
+        for result in ('hit', 'miss'):
+            self.assertIn(
+                'yatube_page_cache_total'
+                f'{{page="index_page",result="{result}"}} 1',
+                lines,
+            )
+        self.assertTrue(
+            any(
+                line.startswith('yatube_db_queries_total{view="posts:index"}')
+                for line in lines
+            )
+        )
+
+    def write_process_file(self, pid, misses):
+        name = f'{pid}-{uuid.uuid4().hex}.json'
+        with open(os.path.join(TEMP_METRICS_DIR, name), 'w') as file:
+            json.dump(
+                [[
+                    'yatube_page_cache_total',
+                    [['page', 'index_page'], ['result', 'miss']],
+                    misses,
+                ]],
+                file,
+            )
+        return name
+
+    def test_files_of_all_processes_are_summed(self):
+        """Значения других процессов из их файлов складываются."""
+        self.client.get(reverse('posts:index'))
+        self.write_process_file(os.getppid(), 4)
+        self.assertIn(
+            'yatube_page_cache_total{page="index_page",result="miss"} 5',
+            self.scrape(),
+        )
+
+    def test_dead_processes_folded_into_aggregate(self):
+        """Файлы завершённых процессов, даже с одним pid, сводятся в один."""
+        self.client.get(reverse('posts:index'))
+        dead = [self.write_process_file(DEAD_PID, 4) for _ in range(2)]
+        for _ in range(2):
+            self.assertIn(
+                'yatube_page_cache_total{page="index_page",result="miss"} 9',
+                self.scrape(),
+            )
+        files = os.listdir(TEMP_METRICS_DIR)
+        self.assertIn(metrics.AGGREGATE_FILE, files)
+        self.assertFalse(set(dead) & set(files))
+
+    def test_only_with_token(self):
+        """Без верного токена эндпоинт отвечает 404 с любого адреса."""
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(reverse('metrics'), **headers)
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_closed_without_token_setting(self):
+        """Пока METRICS_TOKEN не задан, эндпоинт выключен."""
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer None'
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,85 @@
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryRecorder, fingerprint
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@override_settings(
+    SQL_INSTRUMENTATION_SAMPLE_RATE=1,
+    SQL_QUERY_COUNT_THRESHOLD=100,
+    SQL_REPEATED_QUERY_THRESHOLD=3,
+)
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            post = Post.objects.create(
+                text='Пост', author=author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=author, text='Да')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_fingerprint_ignores_values(self):
+        """Запросы, различающиеся только значениями, одной формы."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) LIMIT 1"),
+        )
+
+    def test_recorder_finds_repeated_queries_and_origin(self):
+        """Повторяющийся запрос в цикле находится вместе с местом вызова."""
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for post in Post.objects.all():
+                post.author.username
+        repeated = recorder.repeated(3)
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(len(repeated), 1)
+        shape, total, origin = repeated[0]
+        self.assertEqual(total, 5)
+        self.assertIn('core/tests/test_middleware.py', origin)
+
+    def test_pages_have_no_repeated_queries(self):
+        """Ленты и страница поста не делают запросов в цикле."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:follow_index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.authors[0].username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # Сводка по запросу пишется всегда, на уровне DEBUG.
+                with self.assertLogs('core.middleware', 'DEBUG') as logs:
+                    self.client.get(url)
+                warnings = [
+                    record.getMessage()
+                    for record in logs.records
+                    if record.levelno > logging.DEBUG
+                ]
+                self.assertEqual(warnings, [])
+
+    @override_settings(SQL_QUERY_COUNT_THRESHOLD=0)
+    def test_slow_request_is_logged(self):
+        """Ответ сверх порога запросов попадает в лог с именем маршрута."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+TEMP_PROFILER_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILER_DIR=TEMP_PROFILER_DIR, PROFILER_INTERVAL_MS=1)
+class SamplingProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PROFILER_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        for name in os.listdir(TEMP_PROFILER_DIR):
+            os.remove(os.path.join(TEMP_PROFILER_DIR, name))
+
+    @override_settings(PROFILER_THRESHOLD_MS=0)
+    def test_slow_request_is_dumped(self):
+        """Стеки медленного запроса пишутся с маршрутом и числом запросов."""
+        self.client.get(reverse('posts:index'))
+        names = os.listdir(TEMP_PROFILER_DIR)
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names[0].startswith('posts-index-'))
+        with open(os.path.join(TEMP_PROFILER_DIR, names[0])) as file:
+            lines = file.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertRegex(stack, r'^posts:index \[\d+ queries\];')
+            self.assertGreater(int(count), 0)
+
+    @override_settings(PROFILER_THRESHOLD_MS=60 * 1000)
+    def test_fast_request_is_not_dumped(self):
+        """Запросы быстрее порога не сохраняются."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(os.listdir(TEMP_PROFILER_DIR), [])
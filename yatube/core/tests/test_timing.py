@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def timings(self, url):
+        header = self.client.get(url)['Server-Timing']
+        return {
+            metric.split(';')[0]: metric for metric in header.split(', ')
+        }
+
+    def test_header_lists_phases(self):
+        """Server-Timing содержит фазы db, cache, template и thumbnail."""
+        timings = self.timings(reverse('posts:index'))
+        self.assertEqual(
+            set(timings), {'db', 'cache', 'template', 'thumbnail', 'total'}
+        )
+        self.assertNotIn('queries=0', timings['db'])
+        self.assertIn('misses=', timings['cache'])
+
+    def test_cached_page_is_a_cache_hit(self):
+        """Повторный запрос кэшированной страницы - попадание в кэш."""
+        self.timings(reverse('posts:index'))
+        timings = self.timings(reverse('posts:index'))
+        self.assertNotIn('hits=0', timings['cache'])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_header_is_optional(self):
+        """Без SERVER_TIMING заголовка нет."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
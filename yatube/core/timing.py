@@ -0,0 +1,146 @@
+import functools
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+PHASES = ('db', 'cache', 'template', 'thumbnail')
+CACHE_METHODS = (
+    'add', 'set', 'set_many', 'delete', 'delete_many', 'incr', 'get_or_set'
+)
+_MISSING = object()
+_current = ContextVar('timings', default=None)
+_installed = set()
+
+
+class Timings:
+    """Длительности фаз одного ответа и счётчики к ним."""
+
+    def __init__(self):
+        self.durations = Counter()
+        self.counts = Counter()
+        self.active = Counter()
+
+    def header(self, total):
+        metrics = []
+        for name in PHASES:
+            metric = f'{name};dur={self.durations[name] * 1000:.1f}'
+            if name == 'db':
+                metric += f';desc="queries={self.counts["queries"]}"'
+            elif name == 'cache':
+                metric += (
+                    f';desc="hits={self.counts["hits"]} '
+                    f'misses={self.counts["misses"]}"'
+                )
+            metrics.append(metric)
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def phase(name):
+    """Засекает фазу ответа; вложенные вызовы той же фазы не удваивают."""
+    timings = _current.get()
+    if timings is None or timings.active[name]:
+        yield None
+        return
+    timings.active[name] += 1
+    started = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings.active[name] -= 1
+        timings.durations[name] += time.perf_counter() - started
+
+
+def _timed(method, name):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def _timed_get(get):
+    @functools.wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        with phase('cache') as timings:
+            value = get(self, key, _MISSING, version=version)
+            if timings is not None:
+                timings.counts['misses' if value is _MISSING else 'hits'] += 1
+        return default if value is _MISSING else value
+    return wrapper
+
+
+def _timed_get_many(get_many):
+    @functools.wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        with phase('cache') as timings:
+            values = get_many(self, keys, version=version)
+            if timings is not None:
+                timings.counts['hits'] += len(values)
+                timings.counts['misses'] += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def _install(cls, name, wrap):
+    if (cls, name) not in _installed:
+        _installed.add((cls, name))
+        setattr(cls, name, wrap(getattr(cls, name)))
+
+
+def install():
+    """Обёртки ставятся раз на процесс; вне замера они почти бесплатны."""
+    _install(Template, 'render', lambda method: _timed(method, 'template'))
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        _install(backend, 'get', _timed_get)
+        _install(backend, 'get_many', _timed_get_many)
+        for name in CACHE_METHODS:
+            _install(backend, name, lambda method: _timed(method, 'cache'))
+
+
+def _timed_execute(execute, sql, params, many, context):
+    with phase('db') as timings:
+        if timings is not None:
+            timings.counts['queries'] += 1
+        return execute(sql, params, many, context)
+
+
+class ServerTimingMiddleware:
+    """Заголовок Server-Timing с временем SQL, кэша, шаблонов и миниатюр.
+
+    Включается настройкой SERVER_TIMING.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_timed_execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['Server-Timing'] = timings.header(
+            time.perf_counter() - started
+        )
+        return response
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as metrics_store
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,17 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех процессов для Prometheus; только с METRICS_TOKEN."""
+    if not settings.METRICS_DIR or not settings.METRICS_TOKEN:
+        raise Http404
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    received = request.META.get('HTTP_AUTHORIZATION', '')
+    if not constant_time_compare(received, expected):
+        raise Http404
+    return HttpResponse(
+        metrics_store.render(metrics_store.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
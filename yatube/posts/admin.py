@@ -1,10 +1,38 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
 
-from .models import Group, Post
+from . import search
+from .models import Comment, Follow, Group, Post
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для таблицы без фильтров число строк оценивается по max(id).
+
+    После удалений оценка больше настоящего числа, и последних страниц
+    может не быть: шаблон admin/posts/pagination.html их не показывает.
+    """
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        self.estimated = True
+        manager = self.object_list.model._default_manager
+        return manager.aggregate(total=Max('pk'))['total'] or 0
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,10 +41,29 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group':
+            # Один список групп на запрос вместо запроса в каждой строке.
+            if not hasattr(request, '_group_choices'):
+                request._group_choices = list(formfield.choices)
+            formfield.choices = request._group_choices
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через полнотекстовый индекс, а не LIKE.
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -26,3 +73,18 @@ class GroupAdmin(admin.ModelAdmin):
         'description',
     )
     list_filter = ('slug',)
+
+
+@admin.register(Comment)
+class CommentAdmin(ScalableAdmin):
+    list_display = ('pk', 'text', 'post', 'author', 'created')
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
+    empty_value_display = '-пусто-'
+
+
+@admin.register(Follow)
+class FollowAdmin(ScalableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
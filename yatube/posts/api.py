@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .cache import conditional_page
+from .exporting import CONTENT_TYPES, EXPORTS, export_rows, render_lines
+from .feeds import follow_page, group_feed, index_feed, profile_feed
+from .models import Group, User
+from .thumbnails import post_thumbnail, prefetch_thumbnails
+from .utils import paginate_func
+
+
+def post_projection(request, post):
+    thumbnail = post_thumbnail(post)
+    return {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+        'thumbnail': (
+            request.build_absolute_uri(thumbnail.url) if thumbnail else None
+        ),
+    }
+
+
+def page_response(request, page_obj):
+    """Страница постов в JSON с курсорами соседних страниц."""
+    prefetch_thumbnails(page_obj)
+    return JsonResponse(
+        {
+            'results': [post_projection(request, post) for post in page_obj],
+            'next': page_obj.next_cursor,
+            'previous': page_obj.previous_cursor,
+        },
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+@require_GET
+@conditional_page()
+def index(request):
+    return page_response(
+        request, paginate_func(request, index_feed(), cursor=True)
+    )
+
+
+@require_GET
+@conditional_page()
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return page_response(
+        request, paginate_func(request, group_feed(group), cursor=True)
+    )
+
+
+@require_GET
+@conditional_page()
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return page_response(
+        request, paginate_func(request, profile_feed(author), cursor=True)
+    )
+
+
+@require_GET
+@conditional_page(per_user=True)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется авторизация'}, status=401)
+    return page_response(request, follow_page(request, cursor=True))
+
+
+@require_GET
+@staff_member_required
+def export(request, kind):
+    """Полная выгрузка таблицы потоком, с постоянным расходом памяти."""
+    file_format = request.GET.get('format', 'jsonl')
+    if kind not in EXPORTS or file_format not in CONTENT_TYPES:
+        raise Http404
+    rows = export_rows(kind, settings.EXPORT_BATCH_SIZE)
+    response = StreamingHttpResponse(
+        render_lines(kind, rows, file_format),
+        content_type=f'{CONTENT_TYPES[file_format]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{file_format}"'
+    )
+    return response
@@ -0,0 +1,225 @@
+import json
+import math
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.template.backends.django import Template
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlencode, urlsafe_base64_encode
+
+from .models import Group, Post, UserStats
+
+NAMESPACES = ('posts', 'users', 'about')
+# Маршруты, которые меняют данные или сессию даже на GET.
+SKIPPED_ROUTES = {
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+    'posts:api_export',
+    'users:logout',
+}
+# Маршруты, которые открываются от имени автора поста, а не читателя.
+AUTHOR_ROUTES = {'posts:post_edit'}
+# Маршруты, которые принимают только POST: их данные формы.
+POST_DATA = {'posts:add_comment': {'text': 'Комментарий бенчмарка'}}
+METRICS = ('queries', 'time_ms', 'render_ms')
+TIME_HEADROOM = 3
+MIN_TIME_BUDGET_MS = 50
+
+
+def routes():
+    """Имена маршрутов приложений и имена их аргументов."""
+    resolver = get_resolver()
+    seen = set()
+    for namespace in NAMESPACES:
+        _, namespace_resolver = resolver.namespace_dict[namespace]
+        for pattern in namespace_resolver.url_patterns:
+            name = f'{namespace}:{pattern.name}'
+            if name in seen or name in SKIPPED_ROUTES:
+                continue
+            seen.add(name)
+            yield name, list(pattern.pattern.converters)
+
+
+def sample_objects():
+    """Самые тяжёлые объекты набора: их страницы и измеряются."""
+    stats = UserStats.objects.select_related('user')
+    reader = stats.order_by('-following_count').first().user
+    author = stats.order_by('-posts_count').first().user
+    group = Group.objects.annotate(total=Count('posts')).order_by('-total')
+    post = (
+        Post.objects.select_related('author')
+        .order_by('-comments_count')
+        .first()
+    )
+    return {
+        'reader': reader,
+        'author': post.author,
+        # Самое длинное слово поста: поиск находит хотя бы его.
+        'query': {'q': max(post.text.split(), key=len).strip('.,!?')},
+        'kwargs': {
+            'username': author.username,
+            'slug': group.first().slug,
+            'post_id': post.pk,
+            'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+            'token': default_token_generator.make_token(reader),
+        },
+    }
+
+
+@contextmanager
+def render_timer():
+    """Суммарное время отрисовки шаблонов за время блока, в секундах."""
+    original = Template.render
+    spent = [0.0]
+    depth = [0]
+
+    def render(self, *args, **kwargs):
+        # Вложенные шаблоны (виджеты форм) уже входят во внешний.
+        depth[0] += 1
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            depth[0] -= 1
+            if not depth[0]:
+                spent[0] += time.perf_counter() - started
+
+    Template.render = render
+    try:
+        yield spent
+    finally:
+        Template.render = original
+
+
+def _request(client, url, data):
+    if data is None:
+        return client.get(url)
+    # Записанное откатываем, чтобы повторы шли по тем же данным.
+    with transaction.atomic():
+        response = client.post(url, data)
+        transaction.set_rollback(True)
+    return response
+
+
+def measure(client, url, repeat, data=None):
+    """Медианы числа запросов и времени по repeat холодным запросам.
+
+    С data отправляется POST с этими данными формы.
+    """
+    samples = []
+    for _ in range(repeat):
+        cache.clear()
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            with render_timer() as rendered:
+                started = time.perf_counter()
+                response = _request(client, url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+        samples.append((len(queries), elapsed * 1000, rendered[0] * 1000))
+    return {
+        'status': response.status_code,
+        'queries': int(statistics.median(s[0] for s in samples)),
+        'time_ms': round(statistics.median(s[1] for s in samples), 2),
+        'render_ms': round(statistics.median(s[2] for s in samples), 2),
+    }
+
+
+def run_benchmarks(repeat):
+    sample = sample_objects()
+    reader = Client()
+    reader.force_login(sample['reader'])
+    author = Client()
+    author.force_login(sample['author'])
+    results = {}
+    for name, arguments in routes():
+        kwargs = {key: sample['kwargs'][key] for key in arguments}
+        url = reverse(name, kwargs=kwargs)
+        if name == 'posts:search':
+            url += '?' + urlencode(sample['query'])
+        client = author if name in AUTHOR_ROUTES else reader
+        results[name] = measure(client, url, repeat, POST_DATA.get(name))
+    return results
+
+
+def make_budgets(results):
+    """Бюджеты по замеру: запросы точно, время с запасом на шум."""
+    return {
+        name: {
+            'queries': result['queries'],
+            'time_ms': max(
+                math.ceil(result['time_ms'] * TIME_HEADROOM),
+                MIN_TIME_BUDGET_MS,
+            ),
+            'render_ms': max(
+                math.ceil(result['render_ms'] * TIME_HEADROOM),
+                MIN_TIME_BUDGET_MS,
+            ),
+        }
+        for name, result in results.items()
+    }
+
+
+def check_budgets(results, budgets):
+    """Нарушения бюджетов; маршрут без бюджета - тоже нарушение."""
+    violations = []
+    for name, result in results.items():
+        if result['status'] >= 500:
+            violations.append(f'{name}: ответ {result["status"]}')
+        budget = budgets.get(name)
+        if budget is None:
+            violations.append(f'{name}: нет бюджета')
+            continue
+        for metric in METRICS:
+            if metric in budget and result[metric] > budget[metric]:
+                violations.append(
+                    f'{name}: {metric} {result[metric]} > {budget[metric]}'
+                )
+    return violations
+
+
+def _delta(current, previous):
+    if previous is None:
+        return ''
+    if not previous:
+        return f'{current - previous:+g}'
+    return f'{(current - previous) / previous:+.0%}'
+
+
+def compare(results, baseline):
+    """Таблица «маршрут, метрики и изменение относительно прошлого»."""
+    lines = [
+        f'{"маршрут":32} {"запросы":>12} {"время, мс":>18} '
+        f'{"шаблоны, мс":>18}'
+    ]
+    for name, result in sorted(results.items()):
+        previous = baseline.get(name, {})
+        cells = [
+            f'{result[metric]:g} '
+            f'{_delta(result[metric], previous.get(metric))}'.rstrip()
+            for metric in METRICS
+        ]
+        lines.append(
+            f'{name:32} {cells[0]:>12} {cells[1]:>18} {cells[2]:>18}'
+        )
+    return '\n'.join(lines)
+
+
+def load_json(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def dump_json(data, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,137 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from core import metrics
+
+GENERATION_KEY = 'posts:generation'
+MODIFIED_KEY = 'posts:modified'
+
+
+def shared_cache():
+    """Кэш, общий для всех процессов: запись в одном видна остальным."""
+    return caches['shared']
+
+
+def _page_state(request):
+    """Поколение и время изменения одним обращением к общему кэшу.
+
+    Значения запоминаются на request: ETag, Last-Modified и ключ кэша
+    страницы читают их один раз за запрос.
+    """
+    state = getattr(request, '_posts_page_state', None)
+    if state is not None:
+        return state
+    cache = shared_cache()
+    keys = (GENERATION_KEY, MODIFIED_KEY)
+    values = cache.get_many(keys)
+    if len(values) < len(keys):
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        cache.add(MODIFIED_KEY, int(time.time()), None)
+        values = cache.get_many(keys)
+    state = values[GENERATION_KEY], values[MODIFIED_KEY]
+    if request is not None:
+        request._posts_page_state = state
+    return state
+
+
+def get_generation(request=None):
+    """Текущее поколение данных постов, входящее в ключи кэша страниц."""
+    return _page_state(request)[0]
+
+
+def get_last_modified(request=None):
+    """Время последней записи постов; без записи в кэше - текущее."""
+    return datetime.fromtimestamp(_page_state(request)[1], timezone.utc)
+
+
+def bump_generation():
+    """Делает устаревшими все закэшированные страницы лент."""
+    cache = shared_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+    cache.set(MODIFIED_KEY, int(time.time()), None)
+
+
+def conditional_page(per_user=False):
+    """ETag и Last-Modified по поколению данных, 304 без чтения постов.
+
+    per_user - страница зависит от пользователя: в ETag входят его id и
+    CSRF-токен, которым подписаны формы страницы.
+    """
+
+    def etag(request, *args, **kwargs):
+        user = ''
+        if per_user:
+            csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+            user = f'{request.user.pk}|{csrf}'
+        generation = get_generation(request)
+        raw = f'{generation}|{user}|{request.get_full_path()}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return get_last_modified(request)
+
+    def decorator(view):
+        view = condition(etag_func=etag, last_modified_func=last_modified)(
+            view
+        )
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            # Без Cache-Control браузер может сам решить, что страница
+            # ещё свежая, и не спросить сервер.
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cache_page_generation(timeout, key_prefix):
+    """cache_page, ключ которого меняется при каждой записи постов."""
+
+    def decorator(view):
+        view = vary_on_cookie(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rendered = []
+
+            def render(*args, **kwargs):
+                rendered.append(True)
+                return view(*args, **kwargs)
+
+            prefix = f'{key_prefix}.{get_generation(request)}'
+            response = cache_page(timeout, key_prefix=prefix)(render)(
+                request, *args, **kwargs
+            )
+            # cache_page разрешает и браузеру хранить страницу timeout
+            # секунд; кэш здесь только серверный, а браузер переспрашивает.
+            response['Cache-Control'] = 'private, no-cache'
+            del response['Expires']
+            if request.method in ('GET', 'HEAD'):
+                metrics.inc(
+                    'yatube_page_cache_total',
+                    {
+                        'page': key_prefix,
+                        'result': 'miss' if rendered else 'hit',
+                    },
+                )
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,160 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Follow, MediaBlob, Post, UserStats
+
+
+def recount_user_stats(user_id):
+    """Пересчитывает счётчики пользователя по таблицам постов и подписок."""
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(user_id=user_id).count(),
+        },
+    )
+    return stats
+
+
+def get_user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user_stats(user.pk)
+
+
+def change_user_stats(user_id, field, delta):
+    """Атомарно сдвигает счётчик пользователя на delta."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if not stats.update(**{field: F(field) + delta}) and delta > 0:
+        recount_user_stats(user_id)
+
+
+def change_comments_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def acquire_blob(name):
+    """Ещё одна ссылка на файл медиа."""
+    blobs = MediaBlob.objects.filter(name=name)
+    if blobs.update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refcount=1)
+    except IntegrityError:
+        blobs.update(refcount=F('refcount') + 1)
+
+
+def acquire_blobs(counts):
+    """Ссылки на много файлов сразу: {имя: сколько ссылок добавить}."""
+    existing = set(
+        MediaBlob.objects.filter(name__in=list(counts)).values_list(
+            'name', flat=True
+        )
+    )
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.bulk_create(
+                MediaBlob(name=name, refcount=total)
+                for name, total in counts.items()
+                if name not in existing
+            )
+    except IntegrityError:
+        # Кто-то успел создать запись: добавляем ссылки по одной.
+        for name, total in counts.items():
+            if name not in existing:
+                for _ in range(total):
+                    acquire_blob(name)
+    by_total = {}
+    for name in existing:
+        by_total.setdefault(counts[name], []).append(name)
+    for total, names in by_total.items():
+        MediaBlob.objects.filter(name__in=names).update(
+            refcount=F('refcount') + total
+        )
+
+
+def release_blob(name, storage):
+    """Снимает ссылку; файл без ссылок удаляется после коммита."""
+    blobs = MediaBlob.objects.filter(name=name, refcount__gt=0)
+    if not blobs.update(refcount=F('refcount') - 1):
+        return
+    if MediaBlob.objects.filter(name=name, refcount=0).delete()[0]:
+        transaction.on_commit(lambda: delete_unreferenced_blob(name, storage))
+
+
+def delete_unreferenced_blob(name, storage):
+    """Удаляет файл, если на него так и не появилось новых ссылок.
+
+    Пока шёл коммит, другая транзакция могла загрузить ту же картинку
+    и снова создать запись о файле.
+    """
+    with transaction.atomic():
+        if not MediaBlob.objects.select_for_update().filter(
+            name=name
+        ).exists():
+            storage.delete(name)
+
+
+def _count_by(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .values_list(field)
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+
+def recount_users_chunk(user_ids):
+    """Сверяет счётчики пачки пользователей, возвращает число исправленных."""
+    totals = {
+        'posts_count': _count_by(Post.objects, 'author_id', user_ids),
+        'followers_count': _count_by(Follow.objects, 'author_id', user_ids),
+        'following_count': _count_by(Follow.objects, 'user_id', user_ids),
+    }
+    existing = UserStats.objects.in_bulk(user_ids, field_name='user_id')
+    stale, missing = [], []
+    for user_id in user_ids:
+        counts = {
+            field: values.get(user_id, 0) for field, values in totals.items()
+        }
+        stats = existing.get(user_id)
+        if stats is None:
+            missing.append(UserStats(user_id=user_id, **counts))
+            continue
+        changed = False
+        for field, value in counts.items():
+            if getattr(stats, field) != value:
+                setattr(stats, field, value)
+                changed = True
+        if changed:
+            stale.append(stats)
+    UserStats.objects.bulk_create(missing)
+    UserStats.objects.bulk_update(stale, list(totals))
+    return len(missing) + len(stale)
+
+
+def recount_posts_chunk(post_ids):
+    """Сверяет число комментариев пачки постов."""
+    stale = []
+    posts = (
+        Post.objects.filter(pk__in=post_ids)
+        .annotate(total=Count('comments'))
+        .only('pk', 'comments_count')
+        .order_by()
+    )
+    for post in posts:
+        if post.comments_count != post.total:
+            post.comments_count = post.total
+            stale.append(post)
+    Post.objects.bulk_update(stale, ['comments_count'])
+    return len(stale)
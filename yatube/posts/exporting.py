@@ -0,0 +1,85 @@
+import csv
+import datetime
+import json
+
+from .models import Comment, Follow, Post
+
+EXPORTS = {
+    'posts': (
+        Post.objects,
+        (
+            ('id', 'id'),
+            ('text', 'text'),
+            ('author', 'author__username'),
+            ('group', 'group__slug'),
+            ('image', 'image'),
+            ('pub_date', 'pub_date'),
+        ),
+    ),
+    'comments': (
+        Comment.objects,
+        (
+            ('id', 'id'),
+            ('post', 'post_id'),
+            ('author', 'author__username'),
+            ('text', 'text'),
+            ('created', 'created'),
+        ),
+    ),
+    'follows': (
+        Follow.objects,
+        (
+            ('id', 'id'),
+            ('user', 'user__username'),
+            ('author', 'author__username'),
+        ),
+    ),
+}
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind, batch_size):
+    """Строки таблицы по возрастанию id пачками, без OFFSET и кэша."""
+    queryset, columns = EXPORTS[kind]
+    names = [name for name, _ in columns]
+    paths = [path for _, path in columns]
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list(*paths)[:batch_size]
+        )
+        if not batch:
+            return
+        for values in batch:
+            yield dict(zip(names, map(_plain, values)))
+        last_pk = batch[-1][0]
+
+
+class _Line:
+    """Файлоподобный объект для csv.writer: отдаёт строку, а не пишет."""
+
+    def write(self, value):
+        return value
+
+
+def render_lines(kind, rows, file_format):
+    """Строки JSONL или CSV (с заголовком) для записи или ответа."""
+    if file_format == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow([name for name, _ in EXPORTS[kind][1]])
+        for row in rows:
+            yield writer.writerow(row.values())
+        return
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
@@ -0,0 +1,224 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .cache import shared_cache
+from .models import Follow, Post, TimelineEntry
+from .utils import CursorPage, decode_cursor, paginate_func
+
+RECENT_POSTS_CHUNK_SIZE = 500
+
+
+def _insert_entries(entries):
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """Раскладывает пачку постов по лентам подписчиков их авторов."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    followers = Follow.objects.filter(author_id__in=list(by_author))
+    _insert_entries(
+        TimelineEntry(
+            user_id=user_id,
+            author_id=author_id,
+            post_id=post.pk,
+            pub_date=post.pub_date,
+        )
+        for author_id, user_id in followers.values_list(
+            'author_id', 'user_id'
+        ).iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill_timeline(follow):
+    """Добавляет в ленту подписчика все посты нового автора."""
+    posts = Post.objects.filter(author_id=follow.author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _insert_entries(
+        TimelineEntry(
+            user_id=follow.user_id,
+            author_id=follow.author_id,
+            post_id=post_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def prune_timeline(follow):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+def index_feed():
+    return Post.objects.select_related('group', 'author')
+
+
+def group_feed(group):
+    return group.posts.select_related('author')
+
+
+def profile_feed(author):
+    return author.posts.select_related('group')
+
+
+def timeline_page(request, cursor=None):
+    """Страница ленты подписок, прочитанная из материализованной таблицы."""
+    entries = TimelineEntry.objects.filter(user=request.user).select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = paginate_func(request, entries, cursor)
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return page_obj
+
+
+def _recent_posts_key(author_id):
+    return f'posts:recent:{author_id}'
+
+
+def _load_recent_posts(author_ids):
+    """Последние (pub_date, id) постов авторов: запрос на пачку авторов."""
+    recent = {author_id: [] for author_id in author_ids}
+    for start in range(0, len(author_ids), RECENT_POSTS_CHUNK_SIZE):
+        ranked = (
+            Post.objects.filter(
+                author_id__in=author_ids[start:start + RECENT_POSTS_CHUNK_SIZE]
+            )
+            .annotate(
+                recent_rank=Window(
+                    RowNumber(),
+                    partition_by=[F('author_id')],
+                    order_by=[F('pub_date').desc(), F('pk').desc()],
+                )
+            )
+            .values('pk', 'author_id', 'pub_date', 'recent_rank')
+            .order_by()
+        )
+        sql, params = ranked.query.sql_with_params()
+        # Django 2.2 не умеет фильтровать по оконной функции.
+        posts = Post.objects.raw(
+            f'SELECT * FROM ({sql}) WHERE recent_rank <= %s',
+            [*params, settings.AUTHOR_RECENT_POSTS],
+        )
+        for post in posts:
+            recent[post.author_id].append((post.pub_date, post.pk))
+    for posts in recent.values():
+        posts.sort(reverse=True)
+    return recent
+
+
+def store_recent_posts(author_ids):
+    """Перечитывает списки последних постов авторов в общий кэш."""
+    recent = _load_recent_posts(list(author_ids))
+    shared_cache().set_many(
+        {
+            _recent_posts_key(author_id): posts
+            for author_id, posts in recent.items()
+        },
+        None,
+    )
+    return recent
+
+
+def refresh_recent_posts(author_id):
+    """Обновляет в кэше список последних (pub_date, id) постов автора."""
+    return store_recent_posts([author_id])[author_id]
+
+
+def forget_recent_posts(author_ids):
+    """Убирает списки авторов из кэша: следующее чтение соберёт их заново."""
+    shared_cache().delete_many(
+        [_recent_posts_key(author_id) for author_id in author_ids]
+    )
+
+
+def recent_posts(author_ids):
+    """Списки последних постов авторов: один get_many, промахи - пачкой."""
+    keys = {
+        _recent_posts_key(author_id): author_id for author_id in author_ids
+    }
+    cached = shared_cache().get_many(keys)
+    missing = [
+        author_id for key, author_id in keys.items() if key not in cached
+    ]
+    if missing:
+        for author_id, posts in store_recent_posts(missing).items():
+            cached[_recent_posts_key(author_id)] = posts
+    return [cached[key] for key in keys]
+
+
+def _fetch_posts(ids):
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def _merged_cursor_page(request, merged):
+    per_page = settings.NUMBER_OF_POSTS
+    position = decode_cursor(request.GET.get('before'))
+    if position is not None:
+        newer = [item for item in merged if item > position]
+        if len(newer) > per_page:
+            return CursorPage(
+                _fetch_posts([pk for _, pk in newer[-per_page:]]),
+                None,
+                True,
+                True,
+            )
+    position = decode_cursor(request.GET.get('after'))
+    if position is not None:
+        merged = [item for item in merged if item < position]
+    return CursorPage(
+        _fetch_posts([pk for _, pk in merged[:per_page]]),
+        None,
+        len(merged) > per_page,
+        position is not None,
+    )
+
+
+def merged_page(request, cursor=None):
+    """Лента подписок, собранная k-путевым слиянием списков авторов."""
+    author_ids = Follow.objects.filter(user=request.user).values_list(
+        'author_id', flat=True
+    )
+    merged = list(
+        islice(
+            heapq.merge(*recent_posts(author_ids), reverse=True),
+            settings.FOLLOW_FEED_DEPTH,
+        )
+    )
+    if cursor is None:
+        cursor = settings.CURSOR_PAGINATION
+    if cursor:
+        return _merged_cursor_page(request, merged)
+    paginator = Paginator(
+        [pk for _, pk in merged], settings.NUMBER_OF_POSTS
+    )
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = _fetch_posts(page_obj.object_list)
+    return page_obj
+
+
+def follow_page(request, cursor=None):
+    if settings.FOLLOW_FEED_ENGINE == 'merge':
+        return merged_page(request, cursor)
+    return timeline_page(request, cursor)
@@ -0,0 +1,96 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from posts.benchmarks import (
+    check_budgets,
+    compare,
+    dump_json,
+    load_json,
+    make_budgets,
+    run_benchmarks,
+)
+from posts.thumbnails import wait_for_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет запросы и время всех страниц на тестовой базе '
+        'с синтетическими данными и сверяет их с бюджетами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument('--follows', type=float, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз открывать каждую страницу.',
+        )
+        parser.add_argument(
+            '--budgets', default=settings.BENCHMARK_BUDGETS,
+            help='Файл бюджетов.',
+        )
+        parser.add_argument(
+            '--baseline', help='Результаты прошлого запуска для сравнения.'
+        )
+        parser.add_argument('--output', help='Куда сохранить результаты.')
+        parser.add_argument(
+            '--update-budgets', action='store_true',
+            help='Записать бюджеты по этому замеру вместо проверки.',
+        )
+
+    def measure(self, options):
+        call_command(
+            'generate_data',
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            seed=options['seed'],
+            stdout=self.stdout,
+        )
+        return run_benchmarks(options['repeat'])
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            options['verbosity'], interactive=False, keepdb=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    results = self.measure(options)
+                    wait_for_thumbnails()
+        finally:
+            teardown_databases(old_config, options['verbosity'])
+            teardown_test_environment()
+
+        baseline = {}
+        if options['baseline']:
+            baseline = load_json(options['baseline'])
+        self.stdout.write(compare(results, baseline))
+        if options['output']:
+            dump_json(results, options['output'])
+        if options['update_budgets']:
+            dump_json(make_budgets(results), options['budgets'])
+            return
+        violations = check_budgets(results, load_json(options['budgets']))
+        if violations:
+            raise CommandError(
+                'Превышены бюджеты:\n' + '\n'.join(violations)
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджеты соблюдены.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.exporting import EXPORTS, export_rows, render_lines
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии или подписки в JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl'
+        )
+        parser.add_argument(
+            '--output', default='-', help='Файл выгрузки, - для stdout.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        lines = render_lines(
+            kind, export_rows(kind, options['batch_size']), options['format']
+        )
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(
+            options['output'], 'w', encoding='utf-8', newline=''
+        ) as output:
+            output.writelines(lines)
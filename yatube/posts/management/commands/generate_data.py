@@ -0,0 +1,87 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from posts.cache import bump_generation
+from posts.synthetic import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = 'Создаёт синтетический набор данных для нагрузочных проверок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument(
+            '--image-fraction', type=float, default=0.1,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--until', default='2024-01-01',
+            help='Дата ГГГГ-ММ-ДД, к которой заканчиваются посты (UTC).',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def step(self, title, action):
+        started = time.monotonic()
+        result = action()
+        total = result if isinstance(result, int) else len(result)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{title}: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} строк/с)'
+        )
+        return result
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and (options['posts'] or options['follows']):
+            raise CommandError('Для постов и подписок нужно хотя бы 2 автора.')
+        try:
+            until = parse_date(options['until'])
+        except ValueError:
+            until = None
+        if until is None:
+            raise CommandError('--until ждёт дату в формате ГГГГ-ММ-ДД.')
+        # Фиксированная дата: один seed всегда даёт одни и те же данные.
+        until = datetime(
+            until.year, until.month, until.day, tzinfo=timezone.utc
+        )
+        generator = DatasetGenerator(
+            options['seed'], options['batch_size'], until, options['days']
+        )
+        user_ids = self.step(
+            'Пользователи', lambda: generator.users(options['users'])
+        )
+        group_ids = self.step(
+            'Группы', lambda: generator.groups(options['groups'])
+        )
+        self.step(
+            'Подписки', lambda: generator.follows(user_ids, options['follows'])
+        )
+        post_ids = self.step(
+            'Посты',
+            lambda: generator.posts(
+                options['posts'],
+                user_ids,
+                group_ids,
+                options['image_fraction'],
+            ),
+        )
+        self.step(
+            'Комментарии',
+            lambda: generator.comments(
+                options['comments'], post_ids, user_ids
+            ),
+        )
+        bump_generation()
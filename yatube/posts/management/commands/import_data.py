@@ -0,0 +1,57 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.cache import bump_generation
+from posts.importing import IMPORTERS, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Загружает пользователей, группы, посты, комментарии или подписки.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='Файл JSONL или CSV, - для stdin.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        try:
+            stream = (
+                sys.stdin
+                if path == '-'
+                else open(path, encoding='utf-8', newline='')
+            )
+        except OSError as error:
+            raise CommandError(error)
+        importer = IMPORTERS[options['kind']]()
+        started = time.monotonic()
+        imported = failed = 0
+        with stream:
+            batches = import_rows(
+                importer,
+                read_rows(stream, file_format),
+                options['batch_size'],
+            )
+            for written, errors in batches:
+                imported += written
+                failed += len(errors)
+                for number, error in errors:
+                    self.stderr.write(
+                        f'Строка {number}: {"; ".join(error.messages)}'
+                    )
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Записано {imported}, '
+                    f'{imported / max(elapsed, 1e-6):.0f} строк/с'
+                )
+        bump_generation()
+        self.stdout.write(
+            f'Импортировано: {imported}, с ошибками: {failed}, '
+            f'за {time.monotonic() - started:.1f} с'
+        )
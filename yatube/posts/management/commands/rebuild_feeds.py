@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feeds
+from posts.cache import bump_generation
+from posts.models import Post, TimelineEntry, User
+from posts.utils import iterate_pk_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает ленты подписок под текущий FOLLOW_FEED_ENGINE: '
+        'заново раскладывает посты по лентам и сбрасывает списки авторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        posts = 0
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            if settings.FOLLOW_FEED_ENGINE == 'timeline':
+                for chunk in iterate_pk_chunks(Post.objects, chunk_size):
+                    feeds.fan_out_posts(
+                        Post.objects.filter(pk__in=chunk).only(
+                            'pk', 'author_id', 'pub_date'
+                        )
+                    )
+                    posts += len(chunk)
+        authors = 0
+        for chunk in iterate_pk_chunks(User.objects, chunk_size):
+            feeds.forget_recent_posts(chunk)
+            authors += len(chunk)
+        bump_generation()
+        self.stdout.write(
+            f'Разложено постов: {posts}, сброшено списков авторов: {authors}'
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_posts_chunk, recount_users_chunk
+from posts.models import Post, User
+from posts.utils import iterate_pk_chunks
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписок и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed_users = sum(
+            recount_users_chunk(chunk)
+            for chunk in iterate_pk_chunks(User.objects, chunk_size)
+        )
+        fixed_posts = sum(
+            recount_posts_chunk(chunk)
+            for chunk in iterate_pk_chunks(Post.objects, chunk_size)
+        )
+        self.stdout.write(
+            f'Исправлено пользователей: {fixed_users}, '
+            f'постов: {fixed_posts}'
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.utils import iterate_pk_chunks
+
+
+class Command(BaseCommand):
+    help = 'Заполняет сохранённый HTML текста постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перерисовать все посты, а не только без HTML.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if not options['all']:
+            posts = posts.filter(text_html='')
+        rendered = 0
+        for chunk in iterate_pk_chunks(posts, options['chunk_size']):
+            batch = list(Post.objects.filter(pk__in=chunk).only('pk', 'text'))
+            for post in batch:
+                post.render_text()
+            Post.objects.bulk_update(batch, ['text_html'])
+            rendered += len(batch)
+        self.stdout.write(f'Обновлено постов: {rendered}')
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:41
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_media_blobs(apps, schema_editor):
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    Post = apps.get_model('posts', 'Post')
+    images = (
+        Post.objects.exclude(image__isnull=True)
+        .exclude(image='')
+        .values_list('image')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    MediaBlob.objects.bulk_create(
+        MediaBlob(name=name, refcount=total)
+        for name, total in images
+        if posts.storage.SHARDED_NAME.fullmatch(name)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_text_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл медиа',
+                'verbose_name_plural': 'Файлы медиа',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_media_blobs, migrations.RunPython.noop),
+    ]
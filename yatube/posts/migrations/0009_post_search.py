@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Индекс хранит только токены, текст берётся из posts_post (content=).
+# SQLite пересоздаёт таблицу при AddField/AlterField, и триггеры
+# пропадают вместе со старой таблицей; после каждого migrate их
+# возвращает posts.search.ensure_search_triggers.
+CREATE_SEARCH = [
+    """
+    CREATE VIRTUAL TABLE posts_post_search USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_post_search(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        INSERT INTO posts_post_search(posts_post_search, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_post_search_update AFTER UPDATE OF text
+    ON posts_post
+    BEGIN
+        INSERT INTO posts_post_search(posts_post_search, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO posts_post_search(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    "INSERT INTO posts_post_search(posts_post_search) VALUES ('rebuild')",
+]
+
+DROP_SEARCH = [
+    'DROP TRIGGER posts_post_search_update',
+    'DROP TRIGGER posts_post_search_delete',
+    'DROP TRIGGER posts_post_search_insert',
+    'DROP TABLE posts_post_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_media_blobs'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
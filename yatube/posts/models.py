@@ -1,6 +1,9 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.html import linebreaks
+
+from .storage import post_image_storage
 
 User = get_user_model()
 
@@ -22,7 +25,9 @@ class Group(models.Model):
 class Post(models.Model):
 
     text = models.TextField('Текст поста', help_text='Введите текст')
+    text_html = models.TextField('HTML поста', blank=True, editable=False)
     pub_date = models.DateTimeField('Дата', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     group = models.ForeignKey(
         Group,
         verbose_name='Группа поста',
@@ -43,18 +48,42 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True,
         null=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[: settings.SLICE_END]
 
+    def render_text(self):
+        self.text_html = linebreaks(self.text, autoescape=True)
+
+    def save(self, *args, **kwargs):
+        self.render_text()
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
 
@@ -67,6 +96,14 @@ class Comment(models.Model):
         User, null=True, on_delete=models.CASCADE, related_name='comments'
     )
 
+    class Meta:
+        ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created'
+            )
+        ]
+
     def __str__(self):
         return self.text
 
@@ -91,3 +128,80 @@ class Follow(models.Model):
                 fields=["user", "author"], name="user_author"
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'], name='follow_author_user')
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Читатель',
+        related_name='timeline',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='timeline_user_pub_date',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author'
+            ),
+        ]
+
+
+class MediaBlob(models.Model):
+    name = models.CharField('Файл', max_length=255, unique=True)
+    refcount = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл медиа'
+        verbose_name_plural = 'Файлы медиа'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,171 @@
+import base64
+import binascii
+import math
+import re
+
+from django.db import connection, connections
+
+from .models import Post
+from .utils import MAX_PK, CursorPage
+
+SEARCH_TABLE = 'posts_post_search'
+MAX_TERMS = 10
+# Те же триггеры, что в миграции 0009. SQLite пересоздаёт posts_post при
+# AddField/AlterField, и триггеры пропадают вместе со старой таблицей.
+SEARCH_TRIGGERS = {
+    'posts_post_search_insert': """
+        CREATE TRIGGER IF NOT EXISTS posts_post_search_insert
+        AFTER INSERT ON posts_post
+        BEGIN
+            INSERT INTO posts_post_search(rowid, text)
+            VALUES (new.id, new.text);
+        END
+    """,
+    'posts_post_search_delete': """
+        CREATE TRIGGER IF NOT EXISTS posts_post_search_delete
+        AFTER DELETE ON posts_post
+        BEGIN
+            INSERT INTO posts_post_search(posts_post_search, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    """,
+    'posts_post_search_update': """
+        CREATE TRIGGER IF NOT EXISTS posts_post_search_update
+        AFTER UPDATE OF text ON posts_post
+        BEGIN
+            INSERT INTO posts_post_search(posts_post_search, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO posts_post_search(rowid, text)
+            VALUES (new.id, new.text);
+        END
+    """,
+}
+
+
+def ensure_search_triggers(using='default', **kwargs):
+    """После migrate возвращает пропавшие триггеры и перестраивает индекс.
+
+    Обработчик post_migrate; без таблицы индекса ничего не делает.
+    """
+    target = connections[using]
+    if target.vendor != 'sqlite':
+        return
+    with target.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = %s "
+            "OR (type = 'trigger' AND tbl_name = 'posts_post')",
+            [SEARCH_TABLE],
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        if SEARCH_TABLE not in existing:
+            return
+        missing = set(SEARCH_TRIGGERS) - existing
+        for name in sorted(missing):
+            cursor.execute(SEARCH_TRIGGERS[name])
+        if missing:
+            # Без триггеров индекс мог отстать от таблицы.
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) "
+                "VALUES ('rebuild')"
+            )
+
+
+def match_query(query):
+    """Запрос FTS5 из пользовательского ввода: все слова, по префиксу."""
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def filter_posts(queryset, query):
+    """Оставляет посты, найденные по индексу, без LIKE по всей таблице."""
+    match = match_query(query)
+    if not match:
+        return queryset.none()
+    # pk__in=RawSQL(...) даёт IN ((SELECT ...)), и SQLite берёт из
+    # подзапроса только первую строку.
+    return queryset.extra(
+        where=[
+            f'{Post._meta.db_table}.id IN (SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s)'
+        ],
+        params=[match],
+    )
+
+
+def encode_rank_cursor(post):
+    raw = f'{post.search_rank!r}|{post.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_rank_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, pk = raw.decode().rsplit('|', 1)
+        rank, pk = float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not math.isfinite(rank) or not 0 < pk <= MAX_PK:
+        return None
+    return rank, pk
+
+
+class SearchPage(CursorPage):
+    def encode(self, post):
+        return encode_rank_cursor(post)
+
+
+class SearchPaginator:
+    """Результаты поиска по релевантности (bm25) с курсором (rank, id)."""
+
+    def __init__(self, query, per_page):
+        self.match = match_query(query)
+        self.per_page = int(per_page)
+
+    def _ranked(self, position, descending):
+        sql = (
+            f'SELECT rowid, rank FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s'
+        )
+        params = [self.match]
+        sign, order = ('<', 'DESC') if descending else ('>', 'ASC')
+        if position is not None:
+            rank, pk = position
+            sql += f' AND (rank {sign} %s OR (rank = %s AND rowid {sign} %s))'
+            params += [rank, rank, pk]
+        sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _page(self, rows, has_next, has_previous):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows]
+        )
+        found = []
+        for pk, rank in rows:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                found.append(posts[pk])
+        return SearchPage(found, self, has_next, has_previous)
+
+    def get_page(self, after=None, before=None):
+        if not self.match:
+            return SearchPage([], self, False, False)
+        position = decode_rank_cursor(after)
+        if position is not None:
+            rows = self._ranked(position, descending=False)
+            return self._page(
+                rows[:self.per_page], len(rows) > self.per_page, True
+            )
+        position = decode_rank_cursor(before)
+        if position is not None:
+            rows = self._ranked(position, descending=True)
+            if len(rows) > self.per_page:
+                return self._page(rows[:self.per_page][::-1], True, True)
+        rows = self._ranked(None, descending=False)
+        return self._page(
+            rows[:self.per_page], len(rows) > self.per_page, False
+        )
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import counters, feeds
+from .cache import bump_generation
+from .models import Comment, Follow, Group, Post
+
+
+def uses_timeline():
+    return settings.FOLLOW_FEED_ENGINE == 'timeline'
+
+
+def _image_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # Берём сырое значение, чтобы не подгружать отложенное поле.
+    stored = instance.__dict__.get('image') if instance.pk else None
+    instance._stored_image = _image_name(stored)
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, **kwargs):
+    image = _image_name(instance.__dict__.get('image'))
+    if image == instance._stored_image:
+        return
+    storage = instance.image.storage
+    if storage.is_content_addressed(image):
+        counters.acquire_blob(image)
+    if storage.is_content_addressed(instance._stored_image):
+        counters.release_blob(instance._stored_image, storage)
+    instance._stored_image = image
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, 'posts_count', 1)
+    if not uses_timeline():
+        feeds.refresh_recent_posts(instance.author_id)
+    elif created:
+        feeds.fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    storage = instance.image.storage
+    if storage.is_content_addressed(instance._stored_image):
+        counters.release_blob(instance._stored_image, storage)
+    counters.change_user_stats(instance.author_id, 'posts_count', -1)
+    if not uses_timeline():
+        feeds.refresh_recent_posts(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, 'followers_count', 1)
+        counters.change_user_stats(instance.user_id, 'following_count', 1)
+    if created and uses_timeline():
+        feeds.backfill_timeline(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, 'followers_count', -1)
+    counters.change_user_stats(instance.user_id, 'following_count', -1)
+    if uses_timeline():
+        feeds.prune_timeline(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Follow)
+def pages_changed(sender, **kwargs):
+    bump_generation()
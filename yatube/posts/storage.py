@@ -0,0 +1,78 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+DEFAULT_PERMISSIONS = 0o644
+SHARDED_NAME = re.compile(
+    r'(?:.+/)?'
+    + rf'[0-9a-f]{{{SHARD_WIDTH}}}/' * SHARD_DEPTH
+    + r'[0-9a-f]{64}(?:\.\w+)?'
+)
+
+
+def sharded_name(prefix, digest, extension):
+    """posts/ab/cd/abcd...ext - файлы раскладываются по префиксу хэша."""
+    shards = [
+        digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+    return posixpath.join(prefix, *shards, digest + extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит загрузку под именем из SHA-256 её содержимого.
+
+    Хэш считается на лету, пока файл пишется во временный; одинаковые
+    картинки попадают в один и тот же файл и второй раз не записываются.
+    """
+
+    def _save(self, name, content):
+        prefix = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        directory = self.path(prefix)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            name = sharded_name(prefix, digest.hexdigest(), extension)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.chmod(
+                    temp_path,
+                    self.file_permissions_mode or DEFAULT_PERMISSIONS,
+                )
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def is_content_addressed(self, name):
+        """Имя выдано этим хранилищем; старые файлы ссылки не считают."""
+        return bool(name) and SHARDED_NAME.fullmatch(name) is not None
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяет содержимое, совпадение с
+        # существующим файлом здесь - это дедупликация, а не конфликт.
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,199 @@
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from faker import Faker
+from PIL import Image
+
+from .importing import (
+    CommentImporter,
+    FollowImporter,
+    GroupImporter,
+    PostImporter,
+    UserImporter,
+)
+from .models import Comment, Follow, Group, Post, User
+
+POWER_LAW_EXPONENT = 1.1
+FOLLOWS_PARETO_SHAPE = 1.5
+COMMENT_DELAY_SECONDS = 60 * 60
+IMAGE_VARIANTS = 20
+
+
+def power_law_weights(count, exponent=POWER_LAW_EXPONENT):
+    """Накопленные веса Ципфа: первые по порядку получают львиную долю."""
+    return list(
+        accumulate(1 / (rank + 1) ** exponent for rank in range(count))
+    )
+
+
+class DatasetGenerator:
+    """Детерминированный по seed набор данных, записанный пачками."""
+
+    def __init__(self, seed, batch_size, until, days):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.until = until
+        self.seconds = days * 24 * 60 * 60
+
+    def _write(self, importer, objs):
+        objs = iter(objs)
+        written = 0
+        while True:
+            batch = list(islice(objs, self.batch_size))
+            if not batch:
+                return written
+            with transaction.atomic():
+                importer.after(importer.save(batch))
+            written += len(batch)
+
+    def _new_ids(self, model, create):
+        """id строк, добавленных create(): bulk_create их не возвращает."""
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        create()
+        return list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def _timestamp(self):
+        return self.until - timedelta(
+            seconds=self.random.uniform(0, self.seconds)
+        )
+
+    def users(self, count):
+        unusable = make_password(None)
+        objs = (
+            User(
+                username=f'{self.fake.user_name()}{number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=self.fake.email(),
+                password=unusable,
+            )
+            for number in range(count)
+        )
+        return self._new_ids(User, lambda: self._write(UserImporter(), objs))
+
+    def groups(self, count):
+        objs = (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.fake.slug()}-{number}'[:50],
+                description=self.fake.paragraph(),
+            )
+            for number in range(count)
+        )
+        return self._new_ids(
+            Group, lambda: self._write(GroupImporter(), objs)
+        )
+
+    def follows(self, user_ids, mean):
+        """Граф подписок со степенным распределением популярности."""
+        authors = self.random.sample(user_ids, len(user_ids))
+        weights = power_law_weights(len(authors))
+        scale = mean * (FOLLOWS_PARETO_SHAPE - 1) / FOLLOWS_PARETO_SHAPE
+
+        def objs():
+            for user_id in user_ids:
+                wanted = int(
+                    self.random.paretovariate(FOLLOWS_PARETO_SHAPE) * scale
+                )
+                chosen = set(
+                    self.random.choices(
+                        authors,
+                        cum_weights=weights,
+                        k=min(wanted, len(authors) - 1),
+                    )
+                )
+                chosen.discard(user_id)
+                for author_id in sorted(chosen):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return self._write(FollowImporter(), objs())
+
+    def images(self, count):
+        """Небольшой набор картинок; посты ссылаются на них повторно."""
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for _ in range(count):
+            buffer = io.BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (96, 34), color).save(buffer, 'JPEG')
+            content = ContentFile(buffer.getvalue())
+            names.append(storage.save('posts/synthetic.jpg', content))
+        return names
+
+    def posts(self, count, user_ids, group_ids, image_fraction):
+        authors = self.random.sample(user_ids, len(user_ids))
+        weights = power_law_weights(len(authors))
+        images = self.images(IMAGE_VARIANTS) if image_fraction else []
+
+        def objs():
+            for _ in range(count):
+                post = Post(
+                    author_id=self.random.choices(
+                        authors, cum_weights=weights
+                    )[0],
+                    group_id=(
+                        self.random.choice(group_ids)
+                        if group_ids and self.random.random() < 0.7
+                        else None
+                    ),
+                    text=self.fake.paragraph(
+                        nb_sentences=self.random.randint(1, 8)
+                    ),
+                    image=(
+                        self.random.choice(images)
+                        if images and self.random.random() < image_fraction
+                        else ''
+                    ),
+                )
+                post.pub_date = post.updated = self._timestamp()
+                post.render_text()
+                yield post
+
+        return self._new_ids(
+            Post, lambda: self._write(PostImporter(), objs())
+        )
+
+    def comments(self, count, post_ids, user_ids):
+        """Комментарии всплесками: на немногих постах и сразу после них."""
+        hot = self.random.sample(post_ids, len(post_ids))
+        weights = power_law_weights(len(hot))
+
+        def objs():
+            remaining = count
+            while remaining > 0:
+                size = min(self.batch_size, remaining)
+                targets = self.random.choices(
+                    hot, cum_weights=weights, k=size
+                )
+                published = dict(
+                    Post.objects.filter(pk__in=set(targets)).values_list(
+                        'pk', 'pub_date'
+                    )
+                )
+                for post_id in targets:
+                    created = published[post_id] + timedelta(
+                        seconds=self.random.expovariate(
+                            1 / COMMENT_DELAY_SECONDS
+                        )
+                    )
+                    yield Comment(
+                        post_id=post_id,
+                        author_id=self.random.choice(user_ids),
+                        text=self.fake.sentence(),
+                        created=min(created, self.until),
+                    )
+                remaining -= size
+
+        return self._write(CommentImporter(), objs())
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.author = User.objects.create_user(username='author')
+        Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'group-{number}')
+            for number in range(5)
+        )
+        cls.group = Group.objects.first()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def add_posts(self, count):
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text='Пост')
+            for _ in range(count)
+        )
+
+    def test_post_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        url = reverse('admin:posts_post_changelist')
+        self.add_posts(1)
+        few = self.changelist_queries(url)
+        self.add_posts(20)
+        self.assertEqual(self.changelist_queries(url), few)
+
+    def test_estimated_count_hides_trailing_pages(self):
+        """После удалений оценка завышена: ссылок на конец списка нет."""
+        url = reverse('admin:posts_post_changelist')
+        self.add_posts(1200)
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pk').values('pk')[:300]
+        ).delete()
+        response = self.client.get(url)
+        self.assertTrue(response.context['cl'].paginator.estimated)
+        self.assertContains(response, '?p=3')
+        self.assertNotContains(response, '?p=11')
+        response = self.client.get(url, {'p': 8})
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+
+    def test_comment_and_follow_changelists(self):
+        """Комментарии и подписки доступны в админке."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.admin, text='Да')
+        Follow.objects.create(user=self.admin, author=self.author)
+        for name in ('comment', 'follow'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(f'admin:posts_{name}_changelist')
+                )
+                self.assertEqual(len(response.context['cl'].result_list), 1)
@@ -0,0 +1,138 @@
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(settings.NUMBER_OF_ITERATIONS)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_return_post_projections(self):
+        """Ленты отдают краткие проекции постов."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.reader_client.get(url).json()
+                self.assertEqual(
+                    len(data['results']), settings.NUMBER_OF_POSTS
+                )
+                self.assertEqual(
+                    set(data['results'][0]),
+                    {
+                        'id', 'author', 'group', 'text',
+                        'pub_date', 'updated', 'thumbnail',
+                    },
+                )
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'test-slug')
+
+    def test_cursor_walks_whole_feed(self):
+        """Курсор next проходит ленту без повторов и пропусков."""
+        url = reverse('posts:api_index')
+        seen = []
+        data = self.client.get(url).json()
+        seen.extend(post['id'] for post in data['results'])
+        while data['next']:
+            data = self.client.get(url, {'after': data['next']}).json()
+            seen.extend(post['id'] for post in data['results'])
+        self.assertEqual(
+            seen,
+            list(
+                Post.objects.order_by('-pub_date', '-pk').values_list(
+                    'pk', flat=True
+                )
+            ),
+        )
+
+    def test_not_modified_until_posts_change(self):
+        """Неизменившаяся лента отвечает 304, после записи - новым ETag."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_feeds_not_cached_without_revalidation(self):
+        """Ответы лент, в том числе личной, перепроверяются у сервера."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=(self.group.slug,)),
+            reverse('posts:api_profile', args=(self.author.username,)),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(
+                    response['Cache-Control'], 'private, no-cache'
+                )
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок в API недоступна анониму."""
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(post=cls.post, author=cls.staff, text='Да')
+
+    @override_settings(EXPORT_BATCH_SIZE=1)
+    def test_staff_streams_export(self):
+        """Сотрудник получает выгрузку потоком в JSONL и CSV."""
+        self.client.force_login(self.staff)
+        url = reverse('posts:api_export', args=('comments',))
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['text'] for line in lines], ['Да']
+        )
+        response = self.client.get(url, {'format': 'csv'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], 'id,post,author,text,created')
+        self.assertEqual(len(rows), 2)
+
+    def test_export_closed_for_users(self):
+        """Обычный пользователь выгрузку не получает."""
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:api_export', args=('posts',))
+        )
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..benchmarks import check_budgets, make_budgets, routes, run_benchmarks
+from ..models import Comment
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_data',
+            users=10,
+            groups=2,
+            posts=30,
+            comments=20,
+            follows=3,
+            image_fraction=0,
+            stdout=StringIO(),
+        )
+
+    def test_every_route_is_measured(self):
+        """Бенчмарк открывает все страницы, и ни одна не падает."""
+        results = run_benchmarks(repeat=1)
+        self.assertEqual(set(results), {name for name, _ in routes()})
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertLess(result['status'], 500)
+        self.assertEqual(check_budgets(results, make_budgets(results)), [])
+
+    def test_routes_measured_with_real_work(self):
+        """Поиск идёт по слову, правку открывает автор, комментарий - POST."""
+        comments = Comment.objects.count()
+        results = run_benchmarks(repeat=2)
+        self.assertEqual(results['posts:post_edit']['status'], 200)
+        self.assertEqual(results['posts:search']['status'], 200)
+        self.assertEqual(results['posts:add_comment']['status'], 302)
+        self.assertGreater(
+            results['posts:add_comment']['queries'],
+            results['posts:post_comments']['queries'],
+        )
+        self.assertEqual(Comment.objects.count(), comments)
+
+    def test_budget_violations(self):
+        """Лишний запрос и маршрут без бюджета считаются нарушениями."""
+        results = run_benchmarks(repeat=1)
+        budgets = make_budgets(results)
+        budgets['posts:index']['queries'] -= 1
+        del budgets['posts:follow_index']
+        violations = check_budgets(results, budgets)
+        self.assertEqual(len(violations), 2)
+        self.assertIn('posts:follow_index: нет бюджета', violations)
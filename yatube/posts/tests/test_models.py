@@ -1,7 +1,33 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+
 from django.conf import settings
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import Max, Min
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..counters import delete_unreferenced_blob
+from ..feeds import recent_posts
+from ..importing import Importer, PostImporter
+from ..models import (
+    Comment,
+    Follow,
+    Group,
+    MediaBlob,
+    Post,
+    TimelineEntry,
+    User,
+    UserStats,
+)
+from ..thumbnails import wait_for_thumbnails
 
-from ..models import Group, Post, User
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class PostModelTest(TestCase):
@@ -54,3 +80,356 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, correct
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_recount_counters_repairs_drift(self):
+        """Команда recount_counters исправляет рассинхронизацию."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Post.objects.update(comments_count=5)
+        UserStats.objects.update(posts_count=7)
+        call_command('recount_counters', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 1)
+
+
+class PostTextHtmlTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_text_html_rendered_on_save(self):
+        """При сохранении текст поста экранируется и размечается."""
+        post = Post.objects.create(author=self.user, text='<b>a</b>\n\nb')
+        self.assertEqual(
+            post.text_html, '<p>&lt;b&gt;a&lt;/b&gt;</p>\n\n<p>b</p>'
+        )
+
+    def test_render_posts_fills_missing_html(self):
+        """Команда render_posts заполняет HTML постов без него."""
+        Post.objects.bulk_create([Post(author=self.user, text='Текст')])
+        call_command('render_posts', stdout=StringIO())
+        self.assertEqual(Post.objects.get().text_html, '<p>Текст</p>')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        wait_for_thumbnails()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text='Картинка',
+            image=SimpleUploadedFile(name, b'GIF89a-same-bytes'),
+        )
+
+    def test_same_content_stored_once(self):
+        """Одинаковые картинки пишутся в один файл по хэшу содержимого."""
+        first = self.upload('first.GIF')
+        second = self.upload('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name,
+            r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$',
+        )
+        self.assertTrue(os.path.exists(first.image.path))
+        self.assertEqual(
+            MediaBlob.objects.get(name=first.image.name).refcount, 2
+        )
+
+    def test_last_reference_releases_blob(self):
+        """Запись о файле удаляется вместе с последним постом."""
+        first = self.upload('first.gif')
+        second = self.upload('second.gif')
+        name = first.image.name
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        second.image = None
+        second.save()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_blob_referenced_again_is_kept(self):
+        """Файл не удаляется, если на него снова сослались до удаления."""
+        post = self.upload('first.gif')
+        name = post.image.name
+        storage = post.image.storage
+        delete_unreferenced_blob(name, storage)
+        self.assertTrue(storage.exists(name))
+        MediaBlob.objects.filter(name=name).delete()
+        delete_unreferenced_blob(name, storage)
+        self.assertFalse(storage.exists(name))
+
+
+class ImportDataTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, name, rows):
+        lines = (json.dumps(row, ensure_ascii=False) for row in rows)
+        return self.write(name, '\n'.join(lines))
+
+    def load(self, kind, path):
+        stderr = StringIO()
+        call_command(
+            'import_data',
+            kind,
+            path,
+            batch_size=2,
+            stdout=StringIO(),
+            stderr=stderr,
+        )
+        return stderr.getvalue()
+
+    def test_import_archive(self):
+        """import_data грузит архив пачками и обновляет счётчики и ленты."""
+        users = self.write(
+            'users.csv', 'username,email\nauthor,a@example.com\nreader,\n'
+        )
+        groups = self.write_jsonl(
+            'groups.jsonl',
+            [{'title': 'Группа', 'slug': 'archive', 'description': 'Архив'}],
+        )
+        follows = self.write_jsonl(
+            'follows.jsonl', [{'user': 'reader', 'author': 'author'}]
+        )
+        posts = self.write_jsonl(
+            'posts.jsonl',
+            [
+                {
+                    'text': f'Пост {number}',
+                    'author': 'author',
+                    'group': 'archive',
+                    'pub_date': f'2020-01-0{number + 1}T10:00:00+00:00',
+                }
+                for number in range(3)
+            ]
+            + [{'text': 'Без автора', 'author': 'nobody'}],
+        )
+        for kind, path in (
+            ('users', users),
+            ('users', users),
+            ('groups', groups),
+            ('follows', follows),
+        ):
+            self.load(kind, path)
+        self.assertIn('Строка 4', self.load('posts', posts))
+        post = Post.objects.get(text='Пост 0')
+        comments = self.write_jsonl(
+            'comments.jsonl',
+            [{'post': post.pk, 'author': 'reader', 'text': 'Комментарий'}],
+        )
+        self.load('comments', comments)
+        post.refresh_from_db()
+        author = User.objects.get(username='author')
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.text_html, '<p>Пост 0</p>')
+        self.assertEqual(post.group.slug, 'archive')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 3)
+        self.assertEqual(
+            UserStats.objects.get(user=author).followers_count, 1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='reader').count(), 3
+        )
+
+    def test_import_counts_blob_references(self):
+        """Импорт постов с картинками по хэшу добавляет ссылки на файлы."""
+        User.objects.create_user(username='author')
+        name = f'posts/ab/cd/{"ab" * 32}.jpg'
+        MediaBlob.objects.create(name=name, refcount=1)
+        other = f'posts/ef/01/{"ef" * 32}.jpg'
+        posts = self.write_jsonl(
+            'posts.jsonl',
+            [
+                {'text': 'Пост', 'author': 'author', 'image': image}
+                for image in (name, name, other, 'posts/old.jpg')
+            ],
+        )
+        self.load('posts', posts)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 3)
+        self.assertEqual(MediaBlob.objects.get(name=other).refcount, 1)
+        self.assertFalse(
+            MediaBlob.objects.filter(name='posts/old.jpg').exists()
+        )
+
+    def test_concurrent_post_not_counted_twice(self):
+        """Пост с сайта, записанный во время импорта, не входит в пачку."""
+        author = User.objects.create_user(username='author')
+        name = f'posts/ab/cd/{"ab" * 32}.jpg'
+
+        class WebPostDuringSave(Importer):
+            def save(self, objs):
+                objs = super().save(objs)
+                Post.objects.create(author=author, text='С сайта', image=name)
+                return objs
+
+        class ConcurrentPostImporter(PostImporter, WebPostDuringSave):
+            pass
+
+        importer = ConcurrentPostImporter()
+        rows = [{'text': 'Из архива', 'author': 'author', 'image': name}]
+        importer.prepare(rows)
+        posts = importer.save([importer.build(row) for row in rows])
+        importer.after(posts)
+        self.assertEqual([post.text for post in posts], ['Из архива'])
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
+        self.assertEqual(UserStats.objects.get(user=author).posts_count, 2)
+
+    def test_export_round_trip(self):
+        """Выгрузка export_data снова загружается через import_data."""
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}') for number in range(3)
+        )
+        path = os.path.join(self.directory, 'posts.csv')
+        call_command(
+            'export_data', 'posts', format='csv', output=path, batch_size=2
+        )
+        Post.objects.all().delete()
+        self.load('posts', path)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Пост 0', 'Пост 1', 'Пост 2'],
+        )
+
+
+class GenerateDataTest(TestCase):
+    def generate(self, **options):
+        call_command(
+            'generate_data',
+            users=20,
+            groups=2,
+            posts=50,
+            comments=40,
+            follows=3,
+            image_fraction=0,
+            seed=7,
+            batch_size=16,
+            stdout=StringIO(),
+            **options,
+        )
+        return list(
+            Post.objects.order_by('pk').values_list(
+                'author__username', 'text', 'pub_date'
+            )
+        )
+
+    def test_generated_data_is_consistent_and_repeatable(self):
+        """generate_data создаёт согласованные данные, одинаковые по seed."""
+        first = self.generate()
+        self.assertEqual(len(first), 50)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)), 50
+        )
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 40
+        )
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(self.generate(), first)
+
+    def test_dates_do_not_depend_on_today(self):
+        """Даты постов отсчитываются от --until, а не от сегодняшнего дня."""
+        self.generate(until='2020-06-01', days=30)
+        dates = Post.objects.aggregate(
+            first=Min('pub_date'), last=Max('pub_date')
+        )
+        until = datetime(2020, 6, 1, tzinfo=timezone.utc)
+        self.assertLessEqual(dates['last'], until)
+        self.assertGreaterEqual(dates['first'], until - timedelta(days=30))
+
+    def test_invalid_until(self):
+        """Неверная дата --until - ошибка команды."""
+        with self.assertRaises(CommandError):
+            self.generate(until='01.06.2020')
+
+
+class RebuildFeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def rebuild(self):
+        call_command('rebuild_feeds', chunk_size=2, stdout=StringIO())
+
+    def test_timeline_rebuilt_after_merge(self):
+        """После режима merge ленты совпадают с подписками."""
+        with override_settings(FOLLOW_FEED_ENGINE='merge'):
+            Follow.objects.filter(user=self.reader).delete()
+            Follow.objects.create(user=self.reader, author=self.other)
+            post = Post.objects.create(author=self.other, text='Новый')
+        self.rebuild()
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.reader).values_list(
+                    'post_id', flat=True
+                )
+            ),
+            [post.pk],
+        )
+
+    def test_recent_lists_reset_after_timeline(self):
+        """После режима timeline списки авторов читаются заново."""
+        with override_settings(FOLLOW_FEED_ENGINE='merge'):
+            recent_posts([self.author.pk])
+        post = Post.objects.create(author=self.author, text='Новый')
+        with override_settings(FOLLOW_FEED_ENGINE='merge'):
+            self.rebuild()
+            self.assertEqual(
+                [pk for _, pk in recent_posts([self.author.pk])[0]],
+                [post.pk, self.post.pk],
+            )
+            self.assertFalse(TimelineEntry.objects.exists())
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..utils import encode_cursor
+
+
+class FeedQueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                yield query['sql'], [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, urls):
+        for url in urls:
+            for sql, plan in self.query_plans(url):
+                for step in plan:
+                    with self.subTest(url=url, sql=sql, step=step):
+                        self.assertNotIn('USE TEMP B-TREE', step)
+                        # Подзапрос уже прочитан по индексу, это не таблица.
+                        if step.startswith('SCAN ') and 'subquery' not in step:
+                            self.assertIn('USING', step)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент и поста не сканируют таблицы и не сортируют."""
+        self.assert_plans_use_indexes(
+            (
+                reverse('posts:index'),
+                reverse('posts:group_list', args=(self.group.slug,)),
+                reverse('posts:profile', args=(self.author.username,)),
+                reverse('posts:post_detail', args=(self.post.pk,)),
+                reverse('posts:post_comments', args=(self.post.pk,))
+                + f'?after={encode_cursor(self.comment, "created")}',
+                reverse('posts:follow_index'),
+            )
+        )
+
+    @override_settings(CURSOR_PAGINATION=True, FOLLOW_FEED_ENGINE='merge')
+    def test_cursor_and_merge_queries_use_indexes(self):
+        """Курсорные страницы и слияние лент читают данные по индексам."""
+        after = f'?after={encode_cursor(self.post)}'
+        before = f'?before={encode_cursor(self.post)}'
+        self.assert_plans_use_indexes(
+            (
+                reverse('posts:index') + after,
+                reverse('posts:index') + before,
+                reverse('posts:group_list', args=(self.group.slug,)) + after,
+                reverse('posts:profile', args=(self.author.username,)) + after,
+                reverse('posts:follow_index'),
+            )
+        )
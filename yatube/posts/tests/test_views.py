@@ -1,13 +1,28 @@
+import base64
 import shutil
 import tempfile
 
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Follow, Group, Post, User
+from core.templatetags.post_cards import post_cards
+
+from ..cache import GENERATION_KEY
+from ..models import Comment, Follow, Group, Post, User
+from ..search import SEARCH_TRIGGERS, ensure_search_triggers
+from ..thumbnails import (
+    generate_renditions,
+    post_image_sources,
+    post_thumbnail,
+    prefetch_thumbnails,
+    wait_for_thumbnails,
+)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -50,6 +65,7 @@ class PostsPagesTests(TestCase):
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
+        wait_for_thumbnails()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
@@ -112,6 +128,41 @@ class PostsPagesTests(TestCase):
         )
         self.assertIn(post, response.context['page_obj'])
 
+    def test_thumbnail_placeholder_until_generated(self):
+        """Пока миниатюра не готова, вместо неё выводится заглушка."""
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIsNone(post_thumbnail(post))
+        generate_renditions(post.image.name)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIsNotNone(post_thumbnail(post))
+
+    def test_prefetch_thumbnails_batches_lookups(self):
+        """Миниатюры страницы ищутся одним запросом, затем из кэша."""
+        for number in range(3):
+            Post.objects.create(
+                author=self.author, text='Текст', image=f'posts/{number}.gif'
+            )
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts)
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(list(posts))
+
+    @override_settings(POST_IMAGE_FORMATS=('JPEG',))
+    def test_picture_lists_every_width(self):
+        """В <picture> перечислены миниатюры всех ширин."""
+        generate_renditions(self.post.image.name)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        sources = post_image_sources(response.context['post'])
+        self.assertEqual(
+            [source['type'] for source in sources], ['image/jpeg']
+        )
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertIn(f' {width}w', sources[0]['srcset'])
+        self.assertContains(response, '<picture>')
+
 
 class IndexCache(TestCase):
     @classmethod
@@ -129,14 +180,79 @@ class IndexCache(TestCase):
         cache.clear()
 
     def test_index_cache(self):
+        """Главная кэшируется, пока посты не меняются."""
         response_1 = self.client.get(reverse('posts:index'))
-        Post.objects.create(author=self.post.author, text='Тестовый текст')
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Без сигналов', text_html='<p>Без сигналов</p>'
+        )
         response_2 = self.client.get(reverse('posts:index'))
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response = self.client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, response_2.content)
 
+    def test_index_cache_invalidated_by_new_post(self):
+        """Новый пост сразу виден на закэшированных страницах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        post = Post.objects.create(author=self.author, text='Свежий пост')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn(post, response.context['page_obj'])
+
+    def test_generation_shared_between_processes(self):
+        """Запись в другом процессе сбрасывает страницы и этого процесса."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Тихий', text_html='<p>Тихий</p>')
+        ])
+        self.assertNotContains(self.client.get(url), 'Тихий')
+        caches['shared'].incr(GENERATION_KEY)
+        self.assertContains(self.client.get(url), 'Тихий')
+
+    def test_pages_cached_only_on_server(self):
+        """Браузер не хранит закэшированные страницы, а переспрашивает."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            for attempt in ('miss', 'hit'):
+                with self.subTest(url=url, attempt=attempt):
+                    response = self.client.get(url)
+                    self.assertEqual(
+                        response['Cache-Control'], 'private, no-cache'
+                    )
+                    self.assertFalse(response.has_header('Expires'))
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Test')
+        cls.post = Post.objects.create(text='Первый текст', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_card_cached_until_post_changes(self):
+        """Карточка берётся из кэша, пока пост не изменится."""
+        posts = Post.objects.select_related('author', 'group')
+        self.assertIn('Первый текст', ''.join(post_cards(posts)))
+        Post.objects.update(text='Тихая правка')
+        self.assertIn('Первый текст', ''.join(post_cards(posts.all())))
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertIn('Новый текст', ''.join(post_cards(posts.all())))
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -192,6 +308,225 @@ class PaginatorViewsTest(TestCase):
                         cache.clear()
 
 
+@override_settings(CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Post.objects.bulk_create(
+            [
+                Post(author=cls.user, text=f'Тестовый пост {create_post}')
+                for create_post in range(settings.NUMBER_OF_ITERATIONS)
+            ]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        url = reverse('posts:profile', args=(self.user,))
+        first = self.client.get(url).context['page_obj']
+        self.assertEqual(len(first), settings.FIRST_OF_POSTS)
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            url, {'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            len(second),
+            settings.NUMBER_OF_ITERATIONS - settings.FIRST_OF_POSTS,
+        )
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+        back = self.client.get(
+            url, {'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index'), {'after': '!!'})
+        self.assertEqual(
+            len(response.context['page_obj']), settings.FIRST_OF_POSTS
+        )
+
+    def test_cursor_with_oversized_id_returns_first_page(self):
+        """Курсор с id больше 64 бит не роняет страницы и API."""
+        raw = f'{timezone.now().isoformat()}|{10 ** 30}'.encode()
+        cursor = base64.urlsafe_b64encode(raw).decode()
+        post = Post.objects.first()
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.user,)),
+            reverse('posts:post_comments', args=(post.pk,)),
+            reverse('posts:api_index'),
+        )
+        for url in urls:
+            for name in ('after', 'before'):
+                with self.subTest(url=url, name=name):
+                    response = self.client.get(url, {name: cursor})
+                    self.assertEqual(response.status_code, 200)
+
+
+@override_settings(NUMBER_OF_COMMENTS=2)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(5)
+        )
+
+    def test_comments_loaded_by_pages(self):
+        """Комментарии отдаются порциями, «Показать ещё» грузит следующие."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['Комментарий 0', 'Комментарий 1'],
+        )
+        seen = list(comments)
+        url = reverse('posts:post_comments', args=(self.post.pk,))
+        while comments.has_next():
+            with self.assertNumQueries(2):
+                response = self.client.get(
+                    url, {'after': comments.next_cursor}
+                )
+            comments = response.context['comments']
+            seen.extend(comments)
+        self.assertEqual(seen, list(self.post.comments.order_by('pk')))
+
+
+class ConditionalPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 Not Modified."""
+        urls = (
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # Первый ответ может выставить CSRF-куку, входящую в ETag.
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                self.assertEqual(
+                    response['Cache-Control'], 'private, no-cache'
+                )
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_new_comment_changes_etag(self):
+        """После нового комментария страница поста отдаётся заново."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.authorized_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.best = Post.objects.create(
+            author=cls.user, text='Кошки, кошки и ещё раз кошки'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number} про кошку и собаку')
+            for number in range(settings.NUMBER_OF_ITERATIONS)
+        )
+        Post.objects.create(author=cls.user, text='Только про собак')
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response.context['page_obj']
+
+    def test_results_ranked_and_paged(self):
+        """Поиск ранжирует посты и листается курсором без повторов."""
+        page = self.search(q='кошк')
+        self.assertEqual(page[0], self.best)
+        found = list(page)
+        while page.has_next():
+            page = self.search(q='кошк', after=page.next_cursor)
+            found.extend(page)
+        self.assertEqual(len(found), settings.NUMBER_OF_ITERATIONS + 1)
+        self.assertEqual(len(set(found)), len(found))
+        back = self.search(q='кошк', before=page.previous_cursor)
+        self.assertEqual(back[0], self.best)
+
+    def test_broken_rank_cursor_returns_first_page(self):
+        """Курсор с огромным id или рангом nan/inf - первая страница."""
+        for raw in ('-1.5|' + '9' * 30, 'nan|1', 'inf|1', '-inf|1'):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            for name in ('after', 'before'):
+                with self.subTest(raw=raw, name=name):
+                    page = self.search(q='кошк', **{name: cursor})
+                    self.assertEqual(page[0], self.best)
+
+    def test_triggers_restored_after_migrate(self):
+        """Пропавшие при пересоздании таблицы триггеры возвращаются."""
+        with connection.cursor() as cursor:
+            for name in SEARCH_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        Post.objects.create(author=self.user, text='Бегемот')
+        ensure_search_triggers()
+        self.assertEqual(len(self.search(q='бегемот')), 1)
+        Post.objects.create(author=self.user, text='Бегемотик')
+        self.assertEqual(len(self.search(q='бегемот')), 2)
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.create(author=self.user, text='Жираф')
+        self.assertEqual(list(self.search(q='жираф')), [post])
+        post.text = 'Слон'
+        post.save()
+        self.assertEqual(list(self.search(q='жираф')), [])
+        self.assertEqual(list(self.search(q='слон')), [post])
+        post.delete()
+        self.assertEqual(list(self.search(q='слон')), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через полнотекстовый индекс."""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            response.context['cl'].result_count,
+            settings.NUMBER_OF_ITERATIONS + 1,
+        )
+
+
 class FollowTests(TestCase):
     def setUp(self):
         self.author = User.objects.create_user(username='author')
@@ -231,3 +566,88 @@ class FollowTests(TestCase):
         )
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertIn(post, response.context.get('page_obj').object_list)
+
+    def test_follow_backfills_and_unfollow_prunes_feed(self):
+        """Подписка добавляет старые посты в ленту, отписка их убирает."""
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(self.user.timeline.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+@override_settings(FOLLOW_FEED_ENGINE='merge')
+class MergedFollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        for author in self.authors[:2]:
+            Follow.objects.create(user=self.user, author=author)
+
+    def test_feed_merges_followed_authors(self):
+        """Лента сливает посты подписок в порядке публикации."""
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=author)
+            for number in range(settings.NUMBER_OF_ITERATIONS)
+            for author in self.authors
+        ]
+        expected = [post for post in posts if post.author != self.authors[2]]
+        expected.reverse()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            expected[:settings.NUMBER_OF_POSTS],
+        )
+
+    def test_new_and_deleted_posts_refresh_feed(self):
+        """Новый пост попадает в ленту, удалённый из неё пропадает."""
+        post = Post.objects.create(text='Новый пост', author=self.authors[0])
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'].object_list)
+        post.delete()
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_cold_lists_loaded_in_one_query(self):
+        """Списки всех авторов без кэша читаются одним запросом к постам."""
+        for author in self.authors:
+            Post.objects.create(text='Пост', author=author)
+        for number in range(10):
+            author = User.objects.create_user(username=f'extra{number}')
+            Follow.objects.create(user=self.user, author=author)
+            Post.objects.create(text='Пост', author=author)
+        caches['shared'].clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        post_lists = [
+            query['sql']
+            for query in context.captured_queries
+            if 'recent_rank' in query['sql']
+        ]
+        self.assertEqual(len(post_lists), 1)
+        self.assertEqual(
+            len(caches['shared'].get_many(
+                [f'posts:recent:{author.pk}' for author in self.authors[:2]]
+            )),
+            2,
+        )
@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics
+from core.timing import phase
+
+from .cache import bump_generation
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_RATIO = 339 / 960
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с теми же именем и опциями, но без генерации."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = PostThumbnailBackend()
+executor = ThreadPoolExecutor(
+    max_workers=settings.POST_THUMBNAIL_WORKERS or 1,
+    thread_name_prefix='thumbnails',
+)
+_futures = set()
+_futures_lock = threading.Lock()
+
+
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеют записать sorl и Pillow."""
+    return [
+        image_format
+        for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in EXTENSIONS
+        and (image_format == 'JPEG' or features.check(image_format.lower()))
+    ]
+
+
+def renditions():
+    """Пары (ширина, формат); первая - миниатюра по умолчанию."""
+    widths = sorted(settings.POST_IMAGE_WIDTHS, reverse=True)
+    formats = sorted(supported_formats(), key=lambda name: name != 'JPEG')
+    return [(width, name) for name in formats for width in widths]
+
+
+def _geometry(width):
+    return f'{width}x{round(width * THUMBNAIL_RATIO)}'
+
+
+def rendition_file(name, width, image_format):
+    return backend.thumbnail_file(
+        name, _geometry(width), format=image_format, **THUMBNAIL_OPTIONS
+    )
+
+
+def generate_renditions(name):
+    started = time.perf_counter()
+    result = 'ok'
+    try:
+        with phase('thumbnail'):
+            for width, image_format in renditions():
+                get_thumbnail(
+                    name,
+                    _geometry(width),
+                    format=image_format,
+                    **THUMBNAIL_OPTIONS,
+                )
+        # Страницы с заглушкой вместо картинки больше не актуальны.
+        bump_generation()
+    except Exception:
+        result = 'error'
+        logger.exception('Не удалось сделать миниатюры %s', name)
+    finally:
+        metrics.inc('yatube_thumbnail_generations_total', {'result': result})
+        metrics.observe(
+            'yatube_thumbnail_generation_seconds',
+            {},
+            time.perf_counter() - started,
+            metrics.THUMBNAIL_BUCKETS,
+        )
+
+
+def _generate_in_worker(name):
+    try:
+        generate_renditions(name)
+    finally:
+        connections.close_all()
+
+
+def _forget(future):
+    with _futures_lock:
+        _futures.discard(future)
+
+
+def _submit(name):
+    if not settings.POST_THUMBNAIL_WORKERS:
+        generate_renditions(name)
+        return
+    future = executor.submit(_generate_in_worker, name)
+    with _futures_lock:
+        _futures.add(future)
+    future.add_done_callback(_forget)
+
+
+def schedule_thumbnail(name):
+    """Ставит генерацию миниатюр в фоновый пул после коммита."""
+    pending_key = f'posts:thumbnail:{name}'
+    if cache.add(pending_key, True, settings.POST_THUMBNAIL_PENDING_TIMEOUT):
+        transaction.on_commit(lambda: _submit(name))
+
+
+def wait_for_thumbnails():
+    """Дожидается миниатюр, уже поставленных в пул.
+
+    Нужно тестам и командам, которые затем удаляют каталог медиа;
+    запросы миниатюры не ждут.
+    """
+    with _futures_lock:
+        futures = list(_futures)
+    wait(futures)
+
+
+def _get_many_raw(keys):
+    kvstore = default.kvstore
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return values
+
+
+def _set_renditions(post, ready):
+    post._renditions = ready
+    if not all(ready.values()):
+        schedule_thumbnail(post.image.name)
+
+
+def prefetch_thumbnails(posts):
+    """Находит миниатюры всех постов страницы одним get_many и запросом."""
+    with phase('thumbnail'):
+        _prefetch_thumbnails([post for post in posts if post.image])
+
+
+def _prefetch_thumbnails(posts):
+    specs = renditions()
+    if not isinstance(default.kvstore, KVStore):
+        for post in posts:
+            post_renditions(post)
+        return
+    keys = {
+        (post.pk, spec): add_prefix(
+            rendition_file(post.image.name, *spec).key
+        )
+        for post in posts
+        for spec in specs
+    }
+    values = _get_many_raw(list(keys.values()))
+    for post in posts:
+        ready = {}
+        for spec in specs:
+            value = values[keys[post.pk, spec]]
+            ready[spec] = (
+                None
+                if value == EMPTY_VALUE
+                else deserialize_image_file(value)
+            )
+        _set_renditions(post, ready)
+
+
+def post_renditions(post):
+    """Готовые миниатюры поста по (ширина, формат); None - ещё не готова."""
+    if not post.image:
+        return {}
+    if not hasattr(post, '_renditions'):
+        with phase('thumbnail'):
+            _set_renditions(
+                post,
+                {
+                    spec: default.kvstore.get(
+                        rendition_file(post.image.name, *spec)
+                    )
+                    for spec in renditions()
+                },
+            )
+    return post._renditions
+
+
+def post_thumbnail(post):
+    """Миниатюра по умолчанию; если её нет, запускает генерацию."""
+    ready = post_renditions(post)
+    return ready[renditions()[0]] if ready else None
+
+
+def post_image_sources(post):
+    """Варианты для <source> тега <picture> в порядке предпочтения."""
+    groups = {}
+    for (width, image_format), thumbnail in post_renditions(post).items():
+        if thumbnail is not None:
+            groups.setdefault(image_format, []).append(
+                f'{thumbnail.url} {width}w'
+            )
+    return [
+        {
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(groups[image_format]),
+        }
+        for image_format in supported_formats()
+        if image_format in groups
+    ]
@@ -1,8 +1,161 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# Наибольший id, который помещается в INTEGER SQLite и bigint.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(obj, field='pub_date'):
+    """Курсор из пары (дата, id) записи."""
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбор курсора; для испорченного значения возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = raw.decode().rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None or not 0 < pk <= MAX_PK:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 field='pub_date'):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.field = field
+        self.next_cursor = (
+            self.encode(object_list[-1])
+            if has_next and object_list else None
+        )
+        self.previous_cursor = (
+            self.encode(object_list[0])
+            if has_previous and object_list else None
+        )
+
+    def encode(self, obj):
+        return encode_cursor(obj, self.field)
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (дата, id) без COUNT и OFFSET."""
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 descending=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+        self.descending = descending
+
+    def _ordered(self, descending):
+        sign = '-' if descending else ''
+        return self.object_list.order_by(f'{sign}{self.field}', f'{sign}pk')
+
+    def _beyond(self, position, descending):
+        """Записи за курсором в порядке обхода."""
+        value, pk = position
+        lookup = 'lt' if descending else 'gt'
+        return self._ordered(descending).filter(
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'pk__{lookup}': pk})
+        )
+
+    def _first_page(self):
+        items = list(self._ordered(self.descending)[:self.per_page + 1])
+        return CursorPage(
+            items[:self.per_page],
+            self,
+            len(items) > self.per_page,
+            False,
+            self.field,
+        )
+
+    def get_page(self, after=None, before=None):
+        """Страница после курсора `after` или перед курсором `before`."""
+        position = decode_cursor(after)
+        if position is not None:
+            items = list(
+                self._beyond(position, self.descending)[:self.per_page + 1]
+            )
+            return CursorPage(
+                items[:self.per_page],
+                self,
+                len(items) > self.per_page,
+                True,
+                self.field,
+            )
+        position = decode_cursor(before)
+        if position is not None:
+            items = list(
+                self._beyond(position, not self.descending)[
+                    :self.per_page + 1
+                ]
+            )
+            if len(items) > self.per_page:
+                items = items[:self.per_page][::-1]
+                return CursorPage(items, self, True, True, self.field)
+        return self._first_page()
+
+
+def iterate_pk_chunks(queryset, chunk_size):
+    """Первичные ключи таблицы пачками по возрастанию, без OFFSET."""
+    last_pk = 0
+    while True:
+        chunk = list(
+            queryset.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
 
 
-def paginate_func(request, posts):
+def paginate_func(request, posts, cursor=None):
+    if cursor is None:
+        cursor = settings.CURSOR_PAGINATION
+    if cursor:
+        paginator = CursorPaginator(posts, settings.NUMBER_OF_POSTS)
+        return paginator.get_page(
+            after=request.GET.get('after'), before=request.GET.get('before')
+        )
     paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
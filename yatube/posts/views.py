@@ -1,26 +1,34 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.http import urlencode
 
+from .cache import cache_page_generation, conditional_page
+from .counters import get_user_stats
+from .feeds import follow_page, group_feed, index_feed, profile_feed
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import paginate_func
+from .search import SearchPaginator
+from .thumbnails import prefetch_thumbnails, schedule_thumbnail
+from .utils import CursorPaginator, paginate_func
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_page_generation(settings.PAGE_CACHE_TIMEOUT, 'index_page')
 def index(request):
-    post_list = Post.objects.select_related('group', 'author')
-    page_obj = paginate_func(request, post_list)
+    page_obj = paginate_func(request, index_feed())
+    prefetch_thumbnails(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(per_user=True)
+@cache_page_generation(settings.PAGE_CACHE_TIMEOUT, 'group_page')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author')
-    page_obj = paginate_func(request, posts)
+    page_obj = paginate_func(request, group_feed(group))
+    prefetch_thumbnails(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -28,33 +36,78 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(per_user=True)
+@cache_page_generation(settings.PAGE_CACHE_TIMEOUT, 'profile_page')
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group')
-    page_obj = paginate_func(request=request, posts=posts)
+    page_obj = paginate_func(request, profile_feed(author))
+    prefetch_thumbnails(page_obj)
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(user=request.user, author=author).exists()
     )
+    stats = get_user_stats(author)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'post_count': stats.posts_count,
+        'stats': stats,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, settings.NUMBER_OF_POSTS)
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+    prefetch_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def comments_page(post, after=None):
+    """Комментарии поста по порядку, с авторами в том же запросе."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.NUMBER_OF_COMMENTS,
+        field='created',
+        descending=False,
+    )
+    return paginator.get_page(after=after)
+
+
+@conditional_page(per_user=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
     form = CommentForm()
     context = {
         'post': post,
-        'comments': post.comments.all(),
+        'post_count': get_user_stats(post.author).posts_count,
+        'comments': comments_page(post, request.GET.get('comments_after')),
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context, post_id)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post, request.GET.get('after')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -63,6 +116,8 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if post.image:
+                schedule_thumbnail(post.image.name)
             return redirect('posts:profile', request.user.username)
     context = {
         'form': PostForm()
@@ -79,7 +134,9 @@ def post_edit(request, post_id):
         request.POST or None, files=request.FILES or None, instance=edit_post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if post.image and 'image' in form.changed_data:
+            schedule_thumbnail(post.image.name)
         return redirect('posts:post_detail', post_id)
     context = {'form': form, 'is_edit': True}
     return render(request, 'posts/create_post.html', context)
@@ -99,8 +156,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    context = {'page_obj': paginate_func(request, post_list)}
+    page_obj = follow_page(request)
+    prefetch_thumbnails(page_obj)
+    context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
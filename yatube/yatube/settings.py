@@ -28,7 +28,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,6 +100,20 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 NUMBER_OF_POSTS = 10
 
+NUMBER_OF_COMMENTS = 50
+
+CURSOR_PAGINATION = False
+
+TIMELINE_BATCH_SIZE = 1000
+
+# 'timeline' - материализованные ленты, 'merge' - слияние списков авторов.
+# После смены движка ленты перестраивает команда rebuild_feeds.
+FOLLOW_FEED_ENGINE = 'timeline'
+
+AUTHOR_RECENT_POSTS = 200
+
+FOLLOW_FEED_DEPTH = 1000
+
 SLICE_END = 31
 
 LOGIN_URL = 'users:login'
@@ -132,8 +150,63 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+EXPORT_BATCH_SIZE = 1000
+
+BENCHMARK_BUDGETS = os.path.join(BASE_DIR, 'benchmark_budgets.json')
+
+# Доля запросов, для которых считаются SQL-запросы; 0 - выключено.
+SQL_INSTRUMENTATION_SAMPLE_RATE = 0
+
+SQL_QUERY_COUNT_THRESHOLD = 20
+
+# Столько одинаковых по форме запросов за один ответ - это N+1.
+SQL_REPEATED_QUERY_THRESHOLD = 5
+
+# Заголовок Server-Timing с фазами db, cache, template и thumbnail.
+SERVER_TIMING = False
+
+# Каталог файлов метрик, общий для всех процессов; None - выключено.
+# Файлы завершённых процессов сбор метрик складывает в aggregate.json,
+# поэтому каталог не растёт; очищать его можно только вместе с
+# перезапуском всех процессов, иначе счётчики пойдут назад.
+METRICS_DIR = None
+
+METRICS_FLUSH_INTERVAL = 1
+
+# Токен эндпоинта /metrics/: Prometheus передаёт его в заголовке
+# Authorization: Bearer; None - эндпоинт отвечает 404.
+METRICS_TOKEN = None
+
+# Каталог стеков медленных запросов (collapsed); None - выключено.
+PROFILER_DIR = None
+
+PROFILER_THRESHOLD_MS = 500
+
+PROFILER_INTERVAL_MS = 5
+
+POST_IMAGE_WIDTHS = (480, 960)
+
+# Порядок предпочтения; форматы без поддержки в Pillow пропускаются.
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+
+# Потоки фоновой генерации миниатюр; 0 - генерировать сразу после коммита.
+POST_THUMBNAIL_WORKERS = 2
+
+POST_THUMBNAIL_PENDING_TIMEOUT = 60 * 5
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Общий для всех процессов: поколение страниц и списки постов авторов.
+    # Таблицу создаёт миграция posts 0010.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_shared_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }